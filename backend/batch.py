@@ -0,0 +1,90 @@
+import asyncio
+from typing import AsyncIterator, Awaitable, Callable, Hashable, Iterable, Optional, TypeVar
+
+T = TypeVar('T')
+R = TypeVar('R')
+
+
+async def map_unordered(
+    fn: Callable[[T], Awaitable[R]],
+    items: Iterable[T],
+    limit: int,
+) -> AsyncIterator[tuple[int, Optional[R], Optional[Exception]]]:
+    """
+    Runs fn over items with at most `limit` calls in flight and yields
+    (index, result, error) as each call completes, so one failing item does not
+    stop the others. Pending calls are cancelled if the consumer stops early.
+    """
+    items = iter(enumerate(items))
+    pending: dict[asyncio.Task, int] = {}
+
+    def start_next() -> bool:
+        try:
+            index, item = next(items)
+        except StopIteration:
+            return False
+        pending[asyncio.ensure_future(fn(item))] = index
+        return True
+
+    try:
+        while len(pending) < limit and start_next():
+            pass
+
+        while pending:
+            done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+            for task in done:
+                index = pending.pop(task)
+                error = task.exception()
+                yield index, None if error else task.result(), error
+                start_next()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def map_unique(
+    fn: Callable[[T], Awaitable[R]],
+    items: list[T],
+    key: Callable[[T], Hashable],
+    limit: int,
+) -> AsyncIterator[tuple[int, Optional[R], Optional[Exception]]]:
+    """ Like map_unordered, but items with the same key run once and every one of them gets the outcome. """
+    indices_by_key: dict[Hashable, list[int]] = {}
+    for index, item in enumerate(items):
+        indices_by_key.setdefault(key(item), []).append(index)
+    groups = list(indices_by_key.values())
+
+    async def run_group(indices: list[int]) -> R:
+        return await fn(items[indices[0]])
+
+    async for group, result, error in map_unordered(run_group, groups, limit):
+        for index in groups[group]:
+            yield index, result, error
+
+
+async def merge(*iterators: AsyncIterator[T]) -> AsyncIterator[T]:
+    """ Interleaves several async iterators, yielding items as soon as any of them produces one. """
+    queue: asyncio.Queue = asyncio.Queue()
+    finished = object()
+
+    async def drain(iterator: AsyncIterator[T]):
+        try:
+            async for item in iterator:
+                await queue.put(item)
+        finally:
+            await queue.put(finished)
+
+    tasks = [asyncio.ensure_future(drain(iterator)) for iterator in iterators]
+    try:
+        remaining = len(tasks)
+        while remaining:
+            item = await queue.get()
+            if item is finished:
+                remaining -= 1
+                continue
+            yield item
+        # surfaces an exception raised by any of the iterators
+        await asyncio.gather(*tasks)
+    finally:
+        for task in tasks:
+            task.cancel()
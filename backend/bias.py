@@ -1,27 +1,112 @@
-from jinja2 import Environment, PackageLoader, select_autoescape
-from pydantic_core import from_json
-from vertexai.generative_models import ChatSession
-
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
-import textstat
-
+import asyncio
+import hashlib
+import os
+import re
+import time
+import unicodedata
+from collections import Counter
+from typing import TYPE_CHECKING, AsyncIterator, Optional
+
+from jinja2 import Environment, FileSystemLoader
+
+from .batch import map_unique
+from .cache import TypedCache
+from .chunking import merge_results, split_text
 from .gemini import GeminiClient
+from .jsonstream import InvalidJsonPrefix, JsonStreamParser
+from .metrics import stage_timer
 from .model import AnalyzeResult
+from .prompts import PromptLibrary
+from .singleflight import SingleFlight
+from .stats import LatencyStats
+from .textmetrics import LocalMetrics
+from .tokens import estimate_tokens
+
+if TYPE_CHECKING:
+    from vertexai.generative_models import ChatSession
 
 
 class BiasAnalyzer:
 
-    def __init__(self, gemini_client: GeminiClient):
+    def __init__(
+        self,
+        gemini_client: GeminiClient,
+        analysis_cache: Optional[TypedCache[AnalyzeResult]] = None,
+        max_prompt_tokens: int = 32768,
+        template_auto_reload: bool = False,
+        chunk_tokens: int = 0,
+        chunk_concurrency: int = 4,
+        local_metrics: Optional[LocalMetrics] = None,
+    ):
         self.gemini_client = gemini_client
-        
-        # Load templates from backend/templates/
+        self.max_prompt_tokens = max_prompt_tokens
+
+        # Load templates from backend/templates/, compiled once and cached by the environment.
+        # auto_reload re-reads a template whenever its file changes (for development).
         self.env = Environment(
-            loader=PackageLoader('backend'),
-            autoescape=select_autoescape()
+            loader=FileSystemLoader(os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates")),
+            auto_reload=template_auto_reload
         )
+        self.prompts = PromptLibrary(self.env)
+
+        # sentiment and readability, computed off the event loop while the model runs
+        self.local_metrics = local_metrics or LocalMetrics()
+
+        # concurrent calls for the same text share one model call
+        self._analyze_flight = SingleFlight()
+        self._enhance_flight = SingleFlight()
+
+        # analyses keyed on the page text, so mirrors and tracking-param variants of a URL share one model call
+        self.analysis_cache = analysis_cache
+        self.dedup_hits = 0
+        self.dedup_misses = 0
+
+        # page text that fits in the prompt next to the analyze.jinja instructions
+        self.text_token_budget = max(0, max_prompt_tokens - estimate_tokens(self._render_custom_template("analyze.jinja", text="")))
+
+        # texts longer than chunk_tokens are analyzed in chunks, chunk_concurrency at a time (0 disables chunking)
+        self.chunk_tokens = min(chunk_tokens, self.text_token_budget)
+        self._chunk_semaphore = asyncio.Semaphore(chunk_concurrency)
+        self.chunked_analyses = 0
+        self.chunks_analyzed = 0
+
+        # how model output parsed: clean, repaired, invalid, aborted early, re-requested
+        self.json_outcomes: Counter[str] = Counter()
 
-        # New dependencies
-        self.sentiment_analyzer = SentimentIntensityAnalyzer()
+        # time from sending the enhance prompt to the first streamed chunk
+        self.enhance_ttfb = LatencyStats()
+
+    @staticmethod
+    def _text_key(text: str) -> str:
+        return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def _normalize_text(text: str) -> str:
+        return re.sub(r'\s+', ' ', unicodedata.normalize('NFKC', text)).strip()
+
+    def _analysis_key(self, text: str) -> str:
+        template_hash = self.prompts["analyze.jinja"].digest
+        return f'{self.gemini_client.model_name}:{template_hash}:{self._text_key(self._normalize_text(text))}'
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.dedup_hits + self.dedup_misses
+        return {
+            'analyze_single_flight': self._analyze_flight.stats,
+            'enhance_single_flight': self._enhance_flight.stats,
+            'dedup': {
+                'hits': self.dedup_hits,
+                'misses': self.dedup_misses,
+                'hit_ratio': self.dedup_hits / lookups if lookups else 0.0,
+            },
+            'chunking': {
+                'chunked_analyses': self.chunked_analyses,
+                'chunks_analyzed': self.chunks_analyzed,
+            },
+            'enhance_stream_ttfb': self.enhance_ttfb.stats,
+            'json_output': dict(self.json_outcomes),
+            'local_metrics': self.local_metrics.stats,
+        }
 
     # ------------------------------------------------------------
     # GENDER BIAS SCORING (UNCHANGED)
@@ -51,98 +136,144 @@ class BiasAnalyzer:
         return final_score
 
     # ------------------------------------------------------------
-    # TEMPLATE RENDERER — DO NOT TOUCH
+    # TEMPLATE RENDERER — static prompt parts are precomputed, see prompts.py
     # ------------------------------------------------------------
-    def _render_custom_template(self, template_name: str, **kwargs):
-        import os
-        from jinja2 import Environment, FileSystemLoader
-
-        base_dir = os.path.dirname(os.path.abspath(__file__))
-        template_dir = os.path.join(base_dir, "templates")
-
-        env = Environment(loader=FileSystemLoader(template_dir))
-        template = env.get_template(template_name)
-        return template.render(**kwargs)
-
-    # ------------------------------------------------------------
-    # NEW 1: Sentiment Analysis
-    # ------------------------------------------------------------
-    def _compute_sentiment(self, text: str) -> tuple[int, str]:
-        score_raw = self.sentiment_analyzer.polarity_scores(text)["compound"]
-
-        # Convert -1..1 → 0..100
-        score_0_100 = round((score_raw + 1) * 50)
-
-        # Label
-        if score_raw >= 0.35:
-            label = "Positive"
-        elif score_raw <= -0.35:
-            label = "Negative"
-        else:
-            label = "Neutral"
-
-        return score_0_100, label
-
-    # ------------------------------------------------------------
-    # NEW 2: Readability Analysis
-    # ------------------------------------------------------------
-    def _compute_readability(self, text: str) -> tuple[float, str, str]:
-        try:
-            score = textstat.flesch_reading_ease(text)
-        except:
-            score = 50  # fallback mid-value
-
-        if score < 0:
-            score = 0
-        if score > 100:
-            score = 100
-
-        # Assign human-readable category + comment
-        if score >= 70:
-            level = "Easy"
-            comment = "The content is easy to read and suitable for most audiences."
-        elif score >= 50:
-            level = "Medium"
-            comment = "The content has moderate complexity and may require focus."
-        else:
-            level = "Hard"
-            comment = "The content is difficult to read and may need simplification."
-
-        return round(score, 2), level, comment
+    def _render_custom_template(self, template_name: str, text: str, **kwargs) -> str:
+        return self.prompts[template_name].render(text, **kwargs)
 
     # ------------------------------------------------------------
     # MAIN: GENDER BIAS + NEW METRICS ANALYSIS
     # ------------------------------------------------------------
-    def analyze(self, text: str) -> AnalyzeResult:
-        prompt = self._render_custom_template("analyze.jinja", text=text)
+    async def analyze(self, text: str) -> AnalyzeResult:
+        key = self._analysis_key(text)
+
+        if self.analysis_cache is not None:
+            cached_result = await self.analysis_cache.aget(key)
+            if cached_result is not None:
+                self.dedup_hits += 1
+                return cached_result
+            self.dedup_misses += 1
+
+        return await self._analyze_flight.do(key, lambda: self._analyze_and_store(key, text))
+
+    async def _analyze_and_store(self, key: str, text: str) -> AnalyzeResult:
+        analyze_result = await self._analyze(text)
+        if self.analysis_cache is not None:
+            await self.analysis_cache.store(key, analyze_result)
+        return analyze_result
 
-        chat: ChatSession = self.gemini_client.start_chat()
-        chat_response: str = self.gemini_client.get_chat_response(chat, prompt)
+    async def _analyze_with_model(self, text: str) -> AnalyzeResult:
+        prompt = self._render_custom_template("analyze.jinja", text=text)
 
-        analyze_result = AnalyzeResult.model_validate(from_json(chat_response))
+        # output that cannot be parsed or repaired into an AnalyzeResult is re-requested once
+        for attempt in range(2):
+            chat: 'ChatSession' = await self.gemini_client.start_chat()
+            try:
+                parser = await self.gemini_client.get_chat_response_parsed(chat, prompt, JsonStreamParser)
+                with stage_timer('validate'):
+                    analyze_result = AnalyzeResult.model_validate(parser.value())
+            except InvalidJsonPrefix:
+                self.json_outcomes['aborted'] += 1
+                if attempt:
+                    raise
+            except ValueError:
+                # includes pydantic's ValidationError
+                self.json_outcomes['invalid'] += 1
+                if attempt:
+                    raise
+            else:
+                self.json_outcomes['repaired' if parser.repaired else 'clean'] += 1
+                return analyze_result
+            self.json_outcomes['rerequested'] += 1
+
+    async def _analyze_chunk(self, chunk: str) -> AnalyzeResult:
+        async with self._chunk_semaphore:
+            return await self._analyze_with_model(chunk)
+
+    async def _analyze_chunked(self, text: str) -> AnalyzeResult:
+        # map: one model call per chunk, in parallel; reduce: merge into a single result
+        chunks = split_text(text, self.chunk_tokens)
+        if len(chunks) == 1:
+            return await self._analyze_with_model(chunks[0])
+
+        self.chunked_analyses += 1
+        self.chunks_analyzed += len(chunks)
+        results = await asyncio.gather(*(self._analyze_chunk(chunk) for chunk in chunks))
+        return merge_results(list(results), [len(chunk) for chunk in chunks])
+
+    async def _analyze(self, text: str) -> AnalyzeResult:
+        # local metrics start right away and run alongside the model call
+        metrics_task = asyncio.ensure_future(self.local_metrics.compute(text))
+        try:
+            if self.chunk_tokens and estimate_tokens(text) > self.chunk_tokens:
+                analyze_result = await self._analyze_chunked(text)
+            else:
+                analyze_result = await self._analyze_with_model(text)
+        except BaseException:
+            metrics_task.cancel()
+            raise
 
         # GENDER BIAS FINAL SCORE
         analyze_result.overall_score = self._calculate_score(analyze_result)
 
+        metrics = await metrics_task
+
         # SENTIMENT
-        s_score, s_label = self._compute_sentiment(text)
-        analyze_result.sentiment_score = s_score
-        analyze_result.sentiment_label = s_label
+        analyze_result.sentiment_score = metrics.sentiment_score
+        analyze_result.sentiment_label = metrics.sentiment_label
+        if metrics.sentiment is not None:
+            analyze_result.sentiment_compound = round(metrics.sentiment.compound, 4)
+            analyze_result.sentiment_mean = round(metrics.sentiment.mean, 4)
+            analyze_result.sentiment_variance = round(metrics.sentiment.variance, 4)
+            analyze_result.sentiment_sections = metrics.sentiment.sections
+            analyze_result.sentiment_sentence_count = metrics.sentiment.sentence_count
 
         # READABILITY
-        r_score, r_level, r_comment = self._compute_readability(text)
-        analyze_result.readability_score = r_score
-        analyze_result.readability_level = r_level
-        analyze_result.readability_comment = r_comment
+        analyze_result.readability_score = metrics.readability_score
+        analyze_result.readability_level = metrics.readability_level
+        analyze_result.readability_comment = metrics.readability_comment
 
         return analyze_result
 
+    async def analyze_batch(
+        self, texts: list[str], concurrency: int = 16
+    ) -> AsyncIterator[tuple[int, Optional[AnalyzeResult], Optional[Exception]]]:
+        """
+        Analyzes many texts, yielding (index, result, error) in completion order.
+        Identical texts are analyzed once; model calls still go through the
+        client's concurrency and QPS limits.
+        """
+        async for index, result, error in map_unique(self.analyze, texts, self._analysis_key, concurrency):
+            yield index, result, error
+
     # ------------------------------------------------------------
     # ENHANCEMENT (UNCHANGED)
     # ------------------------------------------------------------
-    def enhance(self, text: str, analyzedResult: AnalyzeResult) -> str:
+    async def enhance(self, text: str, analyzedResult: AnalyzeResult) -> str:
+        key = (self._text_key(text), self._text_key(analyzedResult.model_dump_json()))
+        return await self._enhance_flight.do(key, lambda: self._enhance(text, analyzedResult))
+
+    async def _enhance(self, text: str, analyzedResult: AnalyzeResult) -> str:
         prompt = self._render_custom_template("enhance.jinja", text=text, analyzedResult=analyzedResult)
-        chat: ChatSession = self.gemini_client.start_chat()
-        chat_response: str = self.gemini_client.get_chat_response(chat, prompt)
+        chat: 'ChatSession' = await self.gemini_client.start_chat()
+        chat_response: str = await self.gemini_client.get_chat_response_async(chat, prompt)
         return chat_response
+
+    async def enhance_stream(self, text: str, analyzedResult: AnalyzeResult) -> AsyncIterator[str]:
+        """ Like enhance, but yields the rewrite chunk by chunk as the model produces it. """
+        prompt = self._render_custom_template("enhance.jinja", text=text, analyzedResult=analyzedResult)
+        chat: 'ChatSession' = await self.gemini_client.start_chat()
+
+        start = time.perf_counter()
+        first_chunk = True
+        try:
+            async for chunk in self.gemini_client.stream_chat_response(chat, prompt):
+                if first_chunk:
+                    self.enhance_ttfb.record(time.perf_counter() - start)
+                    first_chunk = False
+                yield chunk
+        except Exception:
+            if first_chunk:
+                self.enhance_ttfb.record(time.perf_counter() - start, error=True)
+            raise
     
@@ -0,0 +1,227 @@
+import asyncio
+import logging
+import threading
+import time
+from typing import TYPE_CHECKING, Optional
+
+from .stats import LatencyStats
+
+# selenium and webdriver_manager are imported when the first browser starts,
+# most workers never render a page
+if TYPE_CHECKING:
+    from selenium import webdriver
+
+logger = logging.getLogger(__name__)
+
+# number of resources the page has requested so far, used to detect network idle
+RESOURCE_COUNT_SCRIPT = "return performance.getEntriesByType('resource').length"
+
+
+class _Browser:
+
+    def __init__(self, driver: 'webdriver.Chrome'):
+        self.driver = driver
+        self.pages = 0
+
+
+class BrowserPool:
+    """
+    Bounded pool of warm headless Chrome instances for pages that need JavaScript.
+
+    Browsers are started on demand up to `size`, health-checked before each use
+    and recycled after `max_pages` renders. Instead of a fixed sleep, a render
+    waits for the DOM to be ready and then for the network to go idle, capped
+    at `render_timeout` seconds.
+    """
+
+    def __init__(
+        self,
+        size: int = 2,
+        max_pages: int = 50,
+        render_timeout: float = 10.0,
+        network_idle_time: float = 0.5,
+        driver_path: Optional[str] = None,
+        driver_retry_after: float = 300.0,
+    ):
+        self.size = size
+        self.max_pages = max_pages
+        self.render_timeout = render_timeout
+        self.network_idle_time = network_idle_time
+
+        self._driver_path = driver_path or None
+        self._driver_path_lock = threading.Lock()
+        # a failed lookup is not retried for driver_retry_after seconds, every render fails fast meanwhile
+        self.driver_retry_after = driver_retry_after
+        self._driver_error: Optional[Exception] = None
+        self._driver_failed_at = 0.0
+        self.driver_failures = 0
+
+        # a slot is held for the whole render; idle browsers are kept warm for reuse
+        self._slots = asyncio.Semaphore(size)
+        self._idle: asyncio.Queue[_Browser] = asyncio.Queue()
+        self._created = 0
+        self.recycled = 0
+
+        self.queue_wait = LatencyStats()
+        self.render_time = LatencyStats()
+
+    def _resolve_driver_path(self) -> str:
+        # resolving the driver can hit the network, so do it once per process
+        with self._driver_path_lock:
+            if self._driver_path is None:
+                if self._driver_error is not None and time.monotonic() - self._driver_failed_at < self.driver_retry_after:
+                    raise RuntimeError(f'chromedriver unavailable: {self._driver_error}')
+
+                from webdriver_manager.chrome import ChromeDriverManager
+
+                try:
+                    self._driver_path = ChromeDriverManager().install()
+                except Exception as e:
+                    self._driver_error = e
+                    self._driver_failed_at = time.monotonic()
+                    self.driver_failures += 1
+                    logger.error('Could not resolve chromedriver, not retrying for %.0fs: %s', self.driver_retry_after, e)
+                    raise
+                self._driver_error = None
+                logger.info('Using chromedriver at %s', self._driver_path)
+            return self._driver_path
+
+    def _start_browser(self) -> _Browser:
+        from selenium import webdriver
+        from selenium.webdriver.chrome.options import Options
+        from selenium.webdriver.chrome.service import Service
+
+        options = Options()
+        options.add_argument('--headless=new')
+        options.add_argument('--no-sandbox')
+        options.add_argument('--disable-dev-shm-usage')
+        # return from get() at DOMContentLoaded, the readiness wait below does the rest
+        options.page_load_strategy = 'eager'
+
+        driver = webdriver.Chrome(service=Service(self._resolve_driver_path()), options=options)
+        driver.set_page_load_timeout(self.render_timeout)
+        return _Browser(driver)
+
+    @staticmethod
+    def _is_healthy(browser: _Browser) -> bool:
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            return browser.driver.execute_script('return 1') == 1
+        except WebDriverException:
+            return False
+
+    @staticmethod
+    def _quit(browser: _Browser):
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            browser.driver.quit()
+        except WebDriverException as e:
+            logger.warning('Error closing browser: %s', e)
+
+    def _wait_until_ready(self, driver: 'webdriver.Chrome', deadline: float):
+        from selenium.common.exceptions import TimeoutException
+        from selenium.webdriver.support.ui import WebDriverWait
+
+        try:
+            WebDriverWait(driver, max(0.0, deadline - time.monotonic())).until(
+                lambda d: d.execute_script('return document.readyState') == 'complete'
+            )
+        except TimeoutException:
+            return
+
+        # network idle: no new resource requests for network_idle_time seconds
+        resources = driver.execute_script(RESOURCE_COUNT_SCRIPT)
+        idle_since = time.monotonic()
+        while time.monotonic() < deadline and time.monotonic() - idle_since < self.network_idle_time:
+            time.sleep(0.1)
+            current = driver.execute_script(RESOURCE_COUNT_SCRIPT)
+            if current != resources:
+                resources = current
+                idle_since = time.monotonic()
+
+    def _render(self, browser: _Browser, uri: str) -> str:
+        from selenium.common.exceptions import TimeoutException
+
+        deadline = time.monotonic() + self.render_timeout
+        browser.pages += 1
+        try:
+            browser.driver.get(uri)
+        except TimeoutException:
+            logger.warning('Page load timed out for %s, using what has rendered so far', uri)
+        self._wait_until_ready(browser.driver, deadline)
+        return browser.driver.page_source
+
+    async def _acquire(self) -> _Browser:
+        await self._slots.acquire()
+        try:
+            while not self._idle.empty():
+                browser = self._idle.get_nowait()
+                if await asyncio.to_thread(self._is_healthy, browser):
+                    return browser
+                logger.warning('Discarding unhealthy browser')
+                await self._discard(browser)
+
+            browser = await asyncio.to_thread(self._start_browser)
+            self._created += 1
+            return browser
+        except BaseException:
+            self._slots.release()
+            raise
+
+    async def _discard(self, browser: _Browser):
+        self._created -= 1
+        self.recycled += 1
+        await asyncio.to_thread(self._quit, browser)
+
+    async def _release(self, browser: _Browser, broken: bool):
+        try:
+            if broken or browser.pages >= self.max_pages:
+                await self._discard(browser)
+            else:
+                self._idle.put_nowait(browser)
+        finally:
+            self._slots.release()
+
+    async def render(self, uri: str) -> str:
+        """ Returns the page source after JavaScript has rendered, or an empty string on failure. """
+        wait_start = time.perf_counter()
+        try:
+            browser = await self._acquire()
+        except Exception as e:
+            logger.error('Could not start browser: %s', e)
+            self.queue_wait.record(time.perf_counter() - wait_start, error=True)
+            return ''
+        self.queue_wait.record(time.perf_counter() - wait_start)
+
+        # the browser is running, so selenium is loaded by now
+        from selenium.common.exceptions import WebDriverException
+
+        broken = False
+        render_start = time.perf_counter()
+        try:
+            return await asyncio.to_thread(self._render, browser, uri)
+        except WebDriverException as e:
+            logger.error('Error with Selenium: %s', e)
+            broken = True
+            return ''
+        finally:
+            self.render_time.record(time.perf_counter() - render_start, error=broken)
+            await self._release(browser, broken)
+
+    async def close(self):
+        while not self._idle.empty():
+            await self._discard(self._idle.get_nowait())
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'size': self.size,
+            'browsers': self._created,
+            'idle': self._idle.qsize(),
+            'recycled': self.recycled,
+            'driver_failures': self.driver_failures,
+            'queue_wait': self.queue_wait.stats,
+            'render_time': self.render_time.stats,
+        }
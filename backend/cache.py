@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import threading
+import time
+import zlib
+from abc import ABC, abstractmethod
+from typing import Any, Generic, Optional, TypeVar
+
+from cachetools import TTLCache
+from pydantic import TypeAdapter
+
+from .db import connect, run_blocking, transaction
+from .metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+
+class CacheBackend(ABC):
+    """ Byte-level key/value store with TTL and size eviction. """
+
+    # whether calls can wait on I/O or locks, see db.run_blocking
+    blocking = True
+
+    @abstractmethod
+    def get(self, key: str) -> Optional[bytes]:
+        ...
+
+    @abstractmethod
+    def set(self, key: str, value: bytes):
+        ...
+
+    @abstractmethod
+    def delete(self, key: str):
+        ...
+
+    @abstractmethod
+    def __len__(self) -> int:
+        ...
+
+    def close(self):
+        pass
+
+
+class MemoryCacheBackend(CacheBackend):
+    """ Per-process cache, lost on restart. """
+
+    blocking = False
+
+    def __init__(self, maxsize: int, ttl: float):
+        self._cache: TTLCache = TTLCache(maxsize=maxsize, ttl=ttl)
+
+    def get(self, key: str) -> Optional[bytes]:
+        return self._cache.get(key)
+
+    def set(self, key: str, value: bytes):
+        self._cache[key] = value
+
+    def delete(self, key: str):
+        self._cache.pop(key, None)
+
+    def __len__(self) -> int:
+        return len(self._cache)
+
+
+class SQLiteCacheBackend(CacheBackend):
+    """
+    On-disk cache that survives restarts and is shared by every worker process
+    on the host. Each namespace is evicted independently: expired rows first,
+    then the least recently used ones once maxsize is exceeded.
+
+    Reads only write `accessed_at` back when it is more than `touch_interval`
+    seconds old, so a hot entry does not take the write lock on every hit.
+    """
+
+    def __init__(self, path: str, namespace: str, maxsize: int, ttl: float, touch_interval: float = 60.0):
+        self.namespace = namespace
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.touch_interval = touch_interval
+
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS cache ('
+            ' namespace TEXT NOT NULL,'
+            ' key TEXT NOT NULL,'
+            ' value BLOB NOT NULL,'
+            ' expires_at REAL NOT NULL,'
+            ' accessed_at REAL NOT NULL,'
+            ' PRIMARY KEY (namespace, key))'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS cache_lru ON cache (namespace, accessed_at)')
+
+    def get(self, key: str) -> Optional[bytes]:
+        now = time.time()
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT value, accessed_at FROM cache WHERE namespace = ? AND key = ? AND expires_at > ?',
+                (self.namespace, key, now)
+            ).fetchone()
+            if row is None:
+                return None
+            if now - row[1] >= self.touch_interval:
+                self._conn.execute(
+                    'UPDATE cache SET accessed_at = ? WHERE namespace = ? AND key = ?',
+                    (now, self.namespace, key)
+                )
+        return row[0]
+
+    def set(self, key: str, value: bytes):
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            self._conn.execute(
+                'INSERT OR REPLACE INTO cache (namespace, key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?, ?)',
+                (self.namespace, key, value, now + self.ttl, now)
+            )
+            self._evict(now)
+
+    def _evict(self, now: float):
+        self._conn.execute('DELETE FROM cache WHERE namespace = ? AND expires_at <= ?', (self.namespace, now))
+        (size,) = self._conn.execute('SELECT COUNT(*) FROM cache WHERE namespace = ?', (self.namespace,)).fetchone()
+        if size > self.maxsize:
+            self._conn.execute(
+                'DELETE FROM cache WHERE namespace = ? AND key IN ('
+                ' SELECT key FROM cache WHERE namespace = ? ORDER BY accessed_at LIMIT ?)',
+                (self.namespace, self.namespace, size - self.maxsize)
+            )
+
+    def delete(self, key: str):
+        with self._lock:
+            self._conn.execute('DELETE FROM cache WHERE namespace = ? AND key = ?', (self.namespace, key))
+
+    def __len__(self) -> int:
+        with self._lock:
+            (size,) = self._conn.execute(
+                'SELECT COUNT(*) FROM cache WHERE namespace = ? AND expires_at > ?',
+                (self.namespace, time.time())
+            ).fetchone()
+        return size
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _without_defaults(schema: Any) -> Any:
+    # defaults can be evaluated per process (timestamps), only names and types identify the schema
+    if isinstance(schema, dict):
+        return {key: _without_defaults(value) for key, value in schema.items() if key != 'default'}
+    if isinstance(schema, list):
+        return [_without_defaults(value) for value in schema]
+    return schema
+
+
+def schema_version(value_type: Any) -> str:
+    """ Short fingerprint of a type's field names and types; changes whenever its fields change. """
+    schema = _without_defaults(TypeAdapter(value_type).json_schema())
+    return hashlib.sha256(json.dumps(schema, sort_keys=True).encode()).hexdigest()[:12]
+
+
+class TypedCache(Generic[T]):
+    """
+    Stores values of one type as compressed JSON on top of a CacheBackend.
+
+    Keys are namespaced by the schema version of the stored type, so entries
+    written by an older version of the model are simply never found again and
+    age out through TTL / LRU eviction.
+    """
+
+    def __init__(self, backend: CacheBackend, value_type: type[T], name: str = ''):
+        self.backend = backend
+        self.name = name
+        self._adapter = TypeAdapter(value_type)
+        self.schema_version = schema_version(value_type)
+        self.hits = 0
+        self.misses = 0
+        self.write_errors = 0
+
+    def _key(self, key: str) -> str:
+        return hashlib.sha256(f'{self.schema_version}:{key}'.encode('utf-8')).hexdigest()
+
+    def get(self, key: str) -> Optional[T]:
+        payload = self.backend.get(self._key(key))
+        if payload is None:
+            self.misses += 1
+            CACHE_LOOKUPS.inc(cache=self.name, result='miss')
+            return None
+        self.hits += 1
+        CACHE_LOOKUPS.inc(cache=self.name, result='hit')
+        return self._adapter.validate_json(zlib.decompress(payload))
+
+    def __setitem__(self, key: str, value: T):
+        self.backend.set(self._key(key), zlib.compress(self._adapter.dump_json(value)))
+
+    async def aget(self, key: str) -> Optional[T]:
+        return await run_blocking(self.backend.blocking, self.get, key)
+
+    async def aset(self, key: str, value: T):
+        await run_blocking(self.backend.blocking, self.__setitem__, key, value)
+
+    async def store(self, key: str, value: T) -> bool:
+        """
+        aset() for a result that is already computed (and paid for): if the
+        write fails, e.g. 'database is locked', it is logged and skipped
+        rather than failing the request.
+        """
+        try:
+            await self.aset(key, value)
+            return True
+        except sqlite3.Error as e:
+            self.write_errors += 1
+            logger.error('Could not write to the %s cache: %s', self.name, e)
+            return False
+
+    def __delitem__(self, key: str):
+        self.backend.delete(self._key(key))
+
+    def __len__(self) -> int:
+        return len(self.backend)
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            'size': len(self),
+            'hits': self.hits,
+            'misses': self.misses,
+            'hit_ratio': self.hits / lookups if lookups else 0.0,
+            'write_errors': self.write_errors,
+        }
+
+
+def create_cache(backend: str, namespace: str, value_type: type[T], maxsize: int, ttl: float, path: str) -> TypedCache[T]:
+    if backend == 'sqlite':
+        return TypedCache(SQLiteCacheBackend(path, namespace, maxsize, ttl), value_type, namespace)
+    if backend == 'memory':
+        return TypedCache(MemoryCacheBackend(maxsize, ttl), value_type, namespace)
+    raise ValueError(f'Unknown cache backend: {backend}')
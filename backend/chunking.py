@@ -0,0 +1,94 @@
+import re
+
+from .model import AnalyzeResult
+from .tokens import CHARS_PER_TOKEN, estimate_tokens
+
+# a blank line, which the extractors put between block elements
+PARAGRAPH_BREAK = re.compile(r'\n\s*\n')
+SENTENCE_END = re.compile(r'(?<=[.!?])\s+')
+
+CATEGORIES = ('stereotyping', 'representation', 'language', 'framing')
+
+
+def _pieces(text: str, max_tokens: int) -> list[str]:
+    """ Paragraphs, broken into sentences (and at last words) when a paragraph alone exceeds the budget. """
+    pieces = []
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        if estimate_tokens(paragraph) <= max_tokens:
+            pieces.append(paragraph)
+            continue
+        for sentence in SENTENCE_END.split(paragraph):
+            if estimate_tokens(sentence) <= max_tokens:
+                pieces.append(sentence)
+                continue
+            max_chars = max_tokens * CHARS_PER_TOKEN
+            words, current = sentence.split(' '), ''
+            for word in words:
+                if current and len(current) + 1 + len(word) > max_chars:
+                    pieces.append(current)
+                    current = ''
+                current = f'{current} {word}' if current else word
+            if current:
+                pieces.append(current)
+    return [piece.strip() for piece in pieces if piece.strip()]
+
+
+def split_text(text: str, max_tokens: int) -> list[str]:
+    """ Packs paragraphs and sentences greedily into chunks of at most max_tokens. """
+    chunks, current = [], ''
+    for piece in _pieces(text, max_tokens):
+        candidate = f'{current} {piece}' if current else piece
+        if current and estimate_tokens(candidate) > max_tokens:
+            chunks.append(current)
+            candidate = piece
+        current = candidate
+    if current:
+        chunks.append(current)
+    return chunks
+
+
+def _weighted_mean(values: list[float], weights: list[int]) -> float:
+    return sum(value * weight for value, weight in zip(values, weights)) / sum(weights)
+
+
+def _join_unique(values: list[str]) -> str:
+    return ' '.join(dict.fromkeys(value.strip() for value in values if value and value.strip()))
+
+
+def merge_results(results: list[AnalyzeResult], lengths: list[int]) -> AnalyzeResult:
+    """
+    Reduces per-chunk analyses into one result for the whole text.
+
+    Scores and the neutral-language percentage are weighted by chunk length.
+    The mention ratio is recomputed from the summed mention counts when every
+    chunk reported them. Each category's feedback and example come from the
+    chunk that scored worst in it, where the bias is most visible.
+    """
+    merged = {
+        'summary': _join_unique([result.summary for result in results]),
+        'positive_aspects': _join_unique([result.positive_aspects for result in results]),
+        'improvement_suggestions': _join_unique([result.improvement_suggestions for result in results]),
+        'gender_neutral_language_percentage': round(
+            _weighted_mean([result.gender_neutral_language_percentage for result in results], lengths), 2
+        ),
+    }
+
+    for category in CATEGORIES:
+        scores = [getattr(result, f'{category}_score') for result in results]
+        worst = min(range(len(results)), key=scores.__getitem__)
+        merged[f'{category}_score'] = int(round(_weighted_mean(scores, lengths)))
+        merged[f'{category}_feedback'] = getattr(results[worst], f'{category}_feedback')
+        merged[f'{category}_example'] = getattr(results[worst], f'{category}_example')
+
+    if all(result.male_mention_count is not None and result.female_mention_count is not None for result in results):
+        male = sum(result.male_mention_count for result in results)
+        female = sum(result.female_mention_count for result in results)
+        merged['male_mention_count'] = male
+        merged['female_mention_count'] = female
+        merged['male_to_female_mention_ratio'] = round(male / female, 2) if female else float(male)
+    else:
+        merged['male_to_female_mention_ratio'] = round(
+            _weighted_mean([result.male_to_female_mention_ratio for result in results], lengths), 2
+        )
+
+    return AnalyzeResult(**merged)
@@ -1,5 +1,7 @@
 from pydantic_settings import BaseSettings, SettingsConfigDict
 
+from .model import FetchStrategy
+
 
 class Settings(BaseSettings):
     model_config = SettingsConfigDict(env_file='.env', env_file_encoding='utf-8')
@@ -8,11 +10,84 @@ class Settings(BaseSettings):
     gcp_service_account_file: str
     gcp_gemini_model: str = 'gemini-2.0-flash'
     gcp_gemini_model2: str = 'gemini-2.5-pro'
+    gcp_gemini_prompt_tokens: int = 32768
+    gcp_gemini_prompt_tokens2: int = 32768
+    gemini_backend: str = 'vertex'
+    fake_latency: float = 0.5
+    fake_tail_latency: float = 0.0
+    fake_tail_rate: float = 0.0
+    fake_error_rate: float = 0.0
+    fake_chunk_size: int = 64
+    fake_chunk_delay: float = 0.0
+    fake_seed: int = 0
+    template_auto_reload: bool = False
     parse_max_content_length: int = 1048576
     parse_chunk_size: int = 8192
+    parse_default_strategy: FetchStrategy = FetchStrategy.STATIC
+    parse_min_text_length: int = 500
+    parse_extractor: str = 'lxml'
+    parse_cache_size: int = 256
+    parse_cache_ttl: int = 300
+    fetch_concurrency: int = 32
+    fetch_per_host_concurrency: int = 4
+    fetch_max_connections: int = 100
+    fetch_connect_timeout: float = 5.0
+    fetch_read_timeout: float = 15.0
+    fetch_max_retries: int = 2
+    fetch_backoff: float = 0.5
+    model_concurrency: int = 8
+    model_qps: float = 0
+    model_timeout: float = 60.0
+    model_max_retries: int = 2
+    model_backoff: float = 1.0
+    model_max_backoff: float = 10.0
+    model_hedge_after: float = 0.0
+    model_breaker_failures: int = 5
+    model_breaker_reset: float = 30.0
+    # off by default: each chunk is a separate model call drawn from the model's daily quota
+    analysis_chunk_tokens: int = 0
+    analysis_chunk_concurrency: int = 4
+    routing_cascade: bool = True
+    routing_escalate_on_invalid: bool = True
+    routing_borderline_low: int = 40
+    routing_borderline_high: int = 60
+    routing_long_text_tokens: int = 0
+    metrics_process_threshold: int = 20000
+    metrics_workers: int = 2
+    metrics_cache_size: int = 1024
+    metrics_server_timing: bool = False
+    batch_max_items: int = 1000
+    batch_concurrency: int = 16
+    jobs_path: str = 'jobs.sqlite3'
+    jobs_workers: int = 4
+    jobs_timeout: float = 300.0
+    jobs_max_attempts: int = 3
+    jobs_retention: float = 86400.0
+    browser_pool_size: int = 2
+    browser_max_pages: int = 50
+    browser_render_timeout: float = 10.0
+    browser_network_idle_time: float = 0.5
+    browser_driver_path: str = ''
+    browser_driver_retry_after: float = 300.0
     daily_limit: int = 20
+    limit_backend: str = 'sqlite'
+    limit_path: str = 'limits.sqlite3'
+    limit_client_header: str = ''
+    model_daily_limit: int = 2000
+    model_daily_limit2: int = 500
     cache_size: int = 1000
     cache_ttl: int = 3600
+    cache_backend: str = 'sqlite'
+    cache_path: str = 'cache.sqlite3'
+    log_level: str = 'INFO'
+    log_path: str = 'app.log'
+    log_json: bool = True
+    log_max_bytes: int = 10485760
+    log_backup_count: int = 5
+    log_rotate_when: str = ''
+    log_console: bool = True
+    log_error_sample_window: float = 60.0
+    log_error_sample_burst: int = 5
     telegram_enabled: bool = False
     telegram_token: str = ''
     telegram_chat_id: int = 0
@@ -0,0 +1,41 @@
+import asyncio
+import sqlite3
+from contextlib import contextmanager
+from typing import Callable, Iterator, TypeVar
+
+T = TypeVar('T')
+
+
+def connect(path: str) -> sqlite3.Connection:
+    """
+    Opens a SQLite database shared by every worker process on the host.
+    Transactions are explicit (see transaction()); a write waits up to 30s
+    for another process's lock before raising 'database is locked'.
+    """
+    conn = sqlite3.connect(path, timeout=30, isolation_level=None, check_same_thread=False)
+    # WAL lets readers in other workers proceed while one worker writes
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.execute('PRAGMA synchronous=NORMAL')
+    return conn
+
+
+@contextmanager
+def transaction(conn: sqlite3.Connection) -> Iterator[sqlite3.Connection]:
+    # IMMEDIATE takes the write lock up front, so a read-modify-write inside is atomic across processes
+    conn.execute('BEGIN IMMEDIATE')
+    try:
+        yield conn
+        conn.execute('COMMIT')
+    except BaseException:
+        conn.execute('ROLLBACK')
+        raise
+
+
+async def run_blocking(blocking: bool, fn: Callable[..., T], *args) -> T:
+    """
+    Calls fn(*args) from async code: on a worker thread when it can block on
+    I/O or a lock (a SQLite store), directly when it cannot (an in-memory one).
+    """
+    if blocking:
+        return await asyncio.to_thread(fn, *args)
+    return fn(*args)
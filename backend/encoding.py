@@ -0,0 +1,79 @@
+import codecs
+import re
+from typing import Optional
+
+# how far into the document we look for a <meta charset>, as browsers do
+SNIFF_BYTES = 1024
+
+META_CHARSET = re.compile(rb'<meta[^>]+charset\s*=\s*["\']?\s*([a-zA-Z0-9_:.-]+)', re.IGNORECASE)
+
+# the -sig / BOM-aware codecs consume the byte order mark instead of emitting it as text
+BOMS = (
+    (codecs.BOM_UTF8, 'utf-8-sig'),
+    (codecs.BOM_UTF16_LE, 'utf-16'),
+    (codecs.BOM_UTF16_BE, 'utf-16'),
+)
+
+DEFAULT_ENCODING = 'utf-8'
+
+
+def _known(encoding: Optional[str]) -> Optional[str]:
+    if not encoding:
+        return None
+    try:
+        return codecs.lookup(encoding.strip()).name
+    except LookupError:
+        return None
+
+
+def sniff_encoding(head: bytes, declared: Optional[str] = None) -> str:
+    """ Picks the page encoding: byte order mark, then the HTTP charset, then <meta charset>, then UTF-8. """
+    for bom, encoding in BOMS:
+        if head.startswith(bom):
+            return encoding
+
+    encoding = _known(declared)
+    if encoding:
+        return encoding
+
+    match = META_CHARSET.search(head[:SNIFF_BYTES])
+    if match:
+        encoding = _known(match.group(1).decode('ascii', errors='ignore'))
+        if encoding:
+            return encoding
+
+    return DEFAULT_ENCODING
+
+
+class StreamDecoder:
+    """
+    Incrementally decodes a byte stream. The first SNIFF_BYTES are held back
+    until the encoding is known; multi-byte characters split across chunks are
+    handled by the incremental codec.
+    """
+
+    def __init__(self, declared: Optional[str] = None):
+        self.declared = declared
+        self.encoding: Optional[str] = None
+        self._head = b''
+        self._decoder = None
+
+    def _start(self):
+        self.encoding = sniff_encoding(self._head, self.declared)
+        self._decoder = codecs.getincrementaldecoder(self.encoding)(errors='replace')
+
+    def decode(self, chunk: bytes) -> str:
+        if self._decoder is None:
+            self._head += chunk
+            if len(self._head) < SNIFF_BYTES:
+                return ''
+            self._start()
+            chunk, self._head = self._head, b''
+        return self._decoder.decode(chunk)
+
+    def flush(self) -> str:
+        if self._decoder is None:
+            self._start()
+            chunk, self._head = self._head, b''
+            return self._decoder.decode(chunk, final=True)
+        return self._decoder.decode(b'', final=True)
@@ -0,0 +1,202 @@
+from abc import ABC, abstractmethod
+
+from lxml import etree
+
+# text directly inside these elements is never shown to the reader
+INVISIBLE_TAGS = {'style', 'script', 'head', 'title', 'meta', 'svg', 'path', 'noscript', 'header', 'footer', 'nav', '[document]'}
+
+# text on either side of these elements' boundaries belongs to different paragraphs
+BLOCK_TAGS = {
+    'address', 'article', 'aside', 'blockquote', 'caption', 'dd', 'details', 'div', 'dl', 'dt', 'fieldset',
+    'figcaption', 'figure', 'form', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'hgroup', 'hr', 'li', 'main', 'ol',
+    'p', 'pre', 'section', 'summary', 'table', 'tr', 'ul',
+}
+# between paragraphs; text nodes within one are joined with a space
+PARAGRAPH_BREAK = '\n\n'
+
+
+class TextExtractor(ABC):
+    """
+    Turns HTML into the visible text we send to the model.
+    Markup can be fed in chunks as it arrives; close() returns the text,
+    with a blank line between text from different block elements.
+    """
+
+    @abstractmethod
+    def feed(self, chunk: str):
+        ...
+
+    @abstractmethod
+    def close(self) -> str:
+        ...
+
+    @property
+    def text_length(self) -> int:
+        """ Characters of visible text extracted so far, 0 if the extractor only works on the full document. """
+        return 0
+
+    @classmethod
+    def extract(cls, html_content: str) -> str:
+        extractor = cls()
+        extractor.feed(html_content)
+        return extractor.close()
+
+
+class SoupExtractor(TextExtractor):
+    """ Builds a full BeautifulSoup tree with html.parser once all markup has arrived. """
+
+    def __init__(self):
+        self._chunks: list[str] = []
+
+    @staticmethod
+    def _tag_visible(element) -> bool:
+        from bs4 import Comment
+
+        if element.strip() == '':
+            return False
+        if element.parent.name in INVISIBLE_TAGS:
+            return False
+        if isinstance(element, Comment):
+            return False
+        if element.parent.get('hidden'):
+            return False
+        if element.parent.get('aria-hidden') == 'true':
+            return False
+
+        return True
+
+    def feed(self, chunk: str):
+        self._chunks.append(chunk)
+
+    @staticmethod
+    def _events(soup):
+        """ ('start', tag), ('text', string) and ('end', tag) in document order, like the lxml target receives. """
+        from bs4 import Tag
+
+        stack, tags = [iter(soup.contents)], []
+        while stack:
+            node = next(stack[-1], None)
+            if node is None:
+                stack.pop()
+                if tags:
+                    yield 'end', tags.pop()
+            elif isinstance(node, Tag):
+                yield 'start', node
+                stack.append(iter(node.contents))
+                tags.append(node)
+            else:
+                yield 'text', node
+
+    def close(self) -> str:
+        # bs4 is only loaded when this extractor is configured
+        from bs4 import BeautifulSoup
+
+        soup = BeautifulSoup(''.join(self._chunks), 'html.parser')
+        parts: list[str] = []
+        paragraph_break = False
+        for event, node in self._events(soup):
+            if event != 'text':
+                paragraph_break = paragraph_break or node.name in BLOCK_TAGS
+            elif self._tag_visible(node):
+                if parts:
+                    parts.append(PARAGRAPH_BREAK if paragraph_break else ' ')
+                parts.append(node.strip())
+                paragraph_break = False
+
+        return ''.join(parts)
+
+
+class _VisibleTextTarget:
+    """
+    lxml parser target: receives start/end/data events without building a tree
+    and keeps the text nodes whose direct parent is visible, matching SoupExtractor.
+    """
+
+    def __init__(self):
+        # text nodes and the separators between them
+        self.parts: list[str] = []
+        self.length = 0
+        # one flag per open element: is text directly inside it visible?
+        self._visible: list[bool] = []
+        self._buffer: list[str] = []
+        # a block element started or ended since the last text node
+        self._paragraph_break = False
+
+    def _flush(self):
+        if self._buffer:
+            text = ''.join(self._buffer).strip()
+            self._buffer.clear()
+            if text:
+                if self.parts:
+                    separator = PARAGRAPH_BREAK if self._paragraph_break else ' '
+                    self.parts.append(separator)
+                    self.length += len(separator)
+                self.parts.append(text)
+                self.length += len(text)
+                self._paragraph_break = False
+
+    def start(self, tag, attrib):
+        self._flush()
+        if tag in BLOCK_TAGS:
+            self._paragraph_break = True
+        visible = (
+            tag not in INVISIBLE_TAGS
+            and not attrib.get('hidden')
+            and attrib.get('aria-hidden') != 'true'
+        )
+        self._visible.append(visible)
+
+    def end(self, tag):
+        self._flush()
+        if tag in BLOCK_TAGS:
+            self._paragraph_break = True
+        if self._visible:
+            self._visible.pop()
+
+    def data(self, data):
+        # text outside any element, or directly inside an invisible one, is dropped without buffering
+        if self._visible and self._visible[-1]:
+            self._buffer.append(data)
+
+    def comment(self, text):
+        self._flush()
+
+    def close(self) -> str:
+        self._flush()
+        return ''.join(self.parts)
+
+
+class LxmlExtractor(TextExtractor):
+    """ Event-driven extractor on libxml2's HTML parser; each chunk is parsed as it is fed. """
+
+    def __init__(self):
+        self._target = _VisibleTextTarget()
+        self._parser = etree.HTMLParser(target=self._target, recover=True)
+        self._fed = False
+
+    def feed(self, chunk: str):
+        if chunk:
+            self._parser.feed(chunk)
+            self._fed = True
+
+    @property
+    def text_length(self) -> int:
+        return self._target.length
+
+    def close(self) -> str:
+        if not self._fed:
+            return ''
+        return self._parser.close()
+
+
+EXTRACTORS: dict[str, type[TextExtractor]] = {
+    'lxml': LxmlExtractor,
+    'soup': SoupExtractor,
+}
+
+
+def extractor_class(name: str) -> type[TextExtractor]:
+    try:
+        return EXTRACTORS[name]
+    except KeyError:
+        raise ValueError(f'Unknown text extractor: {name}') from None
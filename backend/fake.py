@@ -0,0 +1,120 @@
+import asyncio
+import json
+import random
+from collections import deque
+from typing import AsyncIterator, Callable, Iterable, Optional, Union
+
+from google.api_core import exceptions as api_exceptions
+
+# a valid AnalyzeResult, returned when no response is configured
+DEFAULT_RESPONSE = json.dumps({
+    'summary': 'The article reports on a local event.',
+    'stereotyping_feedback': 'No stereotypes found.',
+    'stereotyping_score': 85,
+    'stereotyping_example': '',
+    'representation_feedback': 'Men and women are both quoted.',
+    'representation_score': 80,
+    'representation_example': '',
+    'language_feedback': 'Mostly neutral wording.',
+    'language_score': 90,
+    'language_example': '',
+    'framing_feedback': 'Balanced framing.',
+    'framing_score': 85,
+    'framing_example': '',
+    'positive_aspects': 'Quotes several sources.',
+    'improvement_suggestions': 'None.',
+    'male_to_female_mention_ratio': 1.0,
+    'gender_neutral_language_percentage': 90.0,
+    'male_mention_count': 3,
+    'female_mention_count': 3,
+})
+
+# what a scripted call does: None succeeds, an exception (class or instance) is raised
+Outcome = Optional[Union[BaseException, type]]
+
+
+class FakeChunk:
+
+    def __init__(self, text: str):
+        self.text = text
+
+
+class FakeChatSession:
+
+    def __init__(self, model: 'FakeGenerativeModel'):
+        self.model = model
+
+    async def send_message_async(self, prompt: str, generation_config=None, stream: bool = False, **kwargs):
+        return await self.model._respond(prompt, stream)
+
+
+class FakeGenerativeModel:
+    """
+    In-process stand-in for vertexai's GenerativeModel, for exercising the
+    call path without network access or quota.
+
+    Each call sleeps `latency` seconds (plus `tail_latency` with probability
+    `tail_rate`), then answers with `response` split into `chunk_size`
+    character chunks, `chunk_delay` apart when streamed. Outcomes can be
+    scripted per call with `outcomes`; once the script runs out, calls fail
+    with ServiceUnavailable at `error_rate`. Randomness comes from `seed`, so
+    a run is repeatable.
+    """
+
+    def __init__(
+        self,
+        response: Union[str, Callable[[str], str]] = DEFAULT_RESPONSE,
+        latency: float = 0.0,
+        tail_latency: float = 0.0,
+        tail_rate: float = 0.0,
+        error_rate: float = 0.0,
+        outcomes: Iterable[Outcome] = (),
+        chunk_size: int = 64,
+        chunk_delay: float = 0.0,
+        seed: int = 0,
+    ):
+        self.response = response
+        self.latency = latency
+        self.tail_latency = tail_latency
+        self.tail_rate = tail_rate
+        self.error_rate = error_rate
+        self.chunk_size = chunk_size
+        self.chunk_delay = chunk_delay
+        self._outcomes: deque[Outcome] = deque(outcomes)
+        self._rng = random.Random(seed)
+
+        self.calls = 0
+        self.failures = 0
+
+    def start_chat(self, **kwargs) -> FakeChatSession:
+        return FakeChatSession(self)
+
+    def _outcome(self) -> Outcome:
+        if self._outcomes:
+            return self._outcomes.popleft()
+        if self._rng.random() < self.error_rate:
+            return api_exceptions.ServiceUnavailable('fake backend unavailable')
+        return None
+
+    def _text(self, prompt: str) -> str:
+        return self.response(prompt) if callable(self.response) else self.response
+
+    async def _chunks(self, text: str) -> AsyncIterator[FakeChunk]:
+        for i in range(0, len(text), self.chunk_size):
+            if self.chunk_delay:
+                await asyncio.sleep(self.chunk_delay)
+            yield FakeChunk(text[i:i + self.chunk_size])
+
+    async def _respond(self, prompt: str, stream: bool):
+        self.calls += 1
+        outcome = self._outcome()
+        delay = self.latency + (self.tail_latency if self._rng.random() < self.tail_rate else 0.0)
+        if delay:
+            await asyncio.sleep(delay)
+
+        if outcome is not None:
+            self.failures += 1
+            raise outcome
+
+        text = self._text(prompt)
+        return self._chunks(text) if stream else FakeChunk(text)
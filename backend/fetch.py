@@ -0,0 +1,137 @@
+import asyncio
+import logging
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import AsyncIterator, Optional
+from urllib.parse import urlsplit
+
+import httpx
+from cachetools import LRUCache
+
+from .stats import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+RETRYABLE_STATUS_CODES = {
+    httpx.codes.TOO_MANY_REQUESTS,
+    httpx.codes.BAD_GATEWAY,
+    httpx.codes.SERVICE_UNAVAILABLE,
+    httpx.codes.GATEWAY_TIMEOUT,
+}
+
+# transport failures worth another attempt; e.g. an unsupported scheme is not
+RETRYABLE_ERRORS = (httpx.TimeoutException, httpx.NetworkError, httpx.RemoteProtocolError)
+
+# upper bound on how long we honour a server's Retry-After
+MAX_RETRY_AFTER = 10.0
+
+
+class Fetcher:
+    """
+    Pooled HTTP fetcher used by WebParser.
+
+    A single httpx.AsyncClient keeps keep-alive connection pools per host and
+    negotiates gzip/deflate (plus brotli/zstd when their decoders are installed).
+    Each request has connect/read timeouts, transient failures are retried with
+    jittered exponential backoff, and concurrent requests to one host are capped.
+    """
+
+    def __init__(
+        self,
+        connect_timeout: float = 5.0,
+        read_timeout: float = 15.0,
+        max_retries: int = 2,
+        backoff: float = 0.5,
+        per_host_concurrency: int = 4,
+        max_connections: int = 100,
+        max_hosts: int = 1024,
+    ):
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.per_host_concurrency = per_host_concurrency
+
+        self._client = httpx.AsyncClient(
+            follow_redirects=True,
+            timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+        )
+
+        self._host_semaphores: LRUCache = LRUCache(maxsize=max_hosts)
+        self._host_latency: LRUCache = LRUCache(maxsize=max_hosts)
+        self.retries = 0
+
+    def _host_semaphore(self, host: str) -> asyncio.Semaphore:
+        semaphore = self._host_semaphores.get(host)
+        if semaphore is None:
+            semaphore = self._host_semaphores[host] = asyncio.Semaphore(self.per_host_concurrency)
+        return semaphore
+
+    def _latency(self, host: str) -> LatencyStats:
+        latency = self._host_latency.get(host)
+        if latency is None:
+            latency = self._host_latency[host] = LatencyStats()
+        return latency
+
+    def _retry_delay(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        if response is not None and 'retry-after' in response.headers:
+            retry_after = response.headers['retry-after']
+            try:
+                return min(MAX_RETRY_AFTER, max(0.0, float(retry_after)))
+            except ValueError:
+                try:
+                    return min(MAX_RETRY_AFTER, max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time()))
+                except (TypeError, ValueError):
+                    pass
+
+        # full jitter: a random delay up to the exponential cap
+        return random.uniform(0, self.backoff * 2 ** attempt)
+
+    @asynccontextmanager
+    async def stream(self, uri: str, headers: Optional[dict] = None) -> AsyncIterator[httpx.Response]:
+        """ GET a URI and yield the response with its body still unread. Status codes are not checked. """
+        host = urlsplit(uri).hostname or ''
+        latency = self._latency(host)
+        start = time.perf_counter()
+        failed = True
+
+        async with self._host_semaphore(host):
+            try:
+                attempt = 0
+                while True:
+                    response = None
+                    try:
+                        request = self._client.build_request('GET', uri, headers=headers)
+                        response = await self._client.send(request, stream=True)
+                        if response.status_code not in RETRYABLE_STATUS_CODES or attempt >= self.max_retries:
+                            break
+                        logger.info('Retrying %s after HTTP %d', uri, response.status_code)
+                        await response.aclose()
+                    except RETRYABLE_ERRORS as e:
+                        if attempt >= self.max_retries:
+                            raise
+                        logger.info('Retrying %s after %r', uri, e)
+
+                    await asyncio.sleep(self._retry_delay(attempt, response))
+                    attempt += 1
+                    self.retries += 1
+
+                try:
+                    yield response
+                finally:
+                    await response.aclose()
+
+                failed = response.is_error
+            finally:
+                latency.record(time.perf_counter() - start, error=failed)
+
+    async def aclose(self):
+        await self._client.aclose()
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'retries': self.retries,
+            'hosts': {host: latency.stats for host, latency in self._host_latency.items()},
+        }
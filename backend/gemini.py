@@ -1,9 +1,16 @@
+import asyncio
 import logging
+import threading
+import time
+from typing import TYPE_CHECKING, AsyncIterator, Awaitable, Callable, Optional, Protocol, TypeVar
 
-import vertexai
-from google.oauth2.service_account import Credentials
-from vertexai import generative_models
-from vertexai.generative_models import GenerativeModel, ChatSession
+from .limit import RateLimiter
+from .metrics import MODEL_CALL_SECONDS, MODEL_FIRST_CHUNK_SECONDS, record_stage
+from .resilience import CallPolicy
+from .throttle import Throttle
+
+if TYPE_CHECKING:
+    from vertexai.generative_models import ChatSession, GenerativeModel
 
 logger = logging.getLogger(__name__)
 
@@ -14,39 +21,250 @@ GENERATION_CONFIG = {
     'response_mime_type': 'application/json'
 }
 
-SAFETY_CONFIG = [
-    generative_models.SafetySetting(
-        category=generative_models.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
-        threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
-    ),
-    generative_models.SafetySetting(
-        category=generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT,
-        threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
-    ),
-    generative_models.SafetySetting(
-        category=generative_models.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
-        threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
-    ),
-]
 
+def safety_config() -> list:
+    from vertexai import generative_models
 
-class GeminiClient:
+    return [
+        generative_models.SafetySetting(
+            category=generative_models.HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT,
+            threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
+        ),
+        generative_models.SafetySetting(
+            category=generative_models.HarmCategory.HARM_CATEGORY_HARASSMENT,
+            threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
+        ),
+        generative_models.SafetySetting(
+            category=generative_models.HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT,
+            threshold=generative_models.HarmBlockThreshold.BLOCK_ONLY_HIGH,
+        ),
+    ]
+
+
+class VertexSession:
+    """
+    Project, location and service account shared by the model clients.
+
+    Importing vertexai takes seconds and reading the credentials can fail, so
+    neither happens at import time: the first initialize() (a model call, or
+    the warm-up at startup) loads the service account and runs vertexai.init,
+    once per process however many clients share the session.
+    """
+
+    def __init__(self, project_id: str, location: str, service_account_file: str):
+        self.project_id = project_id
+        self.location = location
+        self.service_account_file = service_account_file
+        self._lock = threading.Lock()
+        self._initialized = False
+
+    def initialize(self):
+        with self._lock:
+            if self._initialized:
+                return
+            import vertexai
+            from google.oauth2 import service_account
+
+            credentials = service_account.Credentials.from_service_account_file(self.service_account_file)
+            vertexai.init(project=self.project_id, location=self.location, credentials=credentials)
+            self._initialized = True
+
+
+class StreamParser(Protocol):
 
-    def __init__(self, project_id: str, location: str, credentials: Credentials, model: str):
-        vertexai.init(project=project_id, location=location, credentials=credentials)
+    def feed(self, chunk: str):
+        ...
+
+
+P = TypeVar('P', bound=StreamParser)
+
+
+class _TextCollector:
+
+    def __init__(self):
+        self._parts: list[str] = []
+
+    def feed(self, chunk: str):
+        self._parts.append(chunk)
+
+    @property
+    def text(self) -> str:
+        return ''.join(self._parts)
+
+
+class GeminiClient:
 
-        logger.info('Loading model: %s', model)
+    def __init__(
+        self,
+        vertex: Optional[VertexSession],
+        model: str,
+        max_concurrency: int = 8,
+        max_qps: float = 0,
+        policy: Optional[CallPolicy] = None,
+        generative_model: Optional['GenerativeModel'] = None,
+        quota: Optional[RateLimiter] = None,
+    ):
+        logger.info('Using model: %s', model)
         logger.info('Generation config: %s', GENERATION_CONFIG)
 
-        self.model = GenerativeModel(model, safety_settings=SAFETY_CONFIG)
+        self.model_name = model
+        self.vertex = vertex
+        # created on first use unless one is passed in (the fake backend)
+        self._model = generative_model
+        self._model_lock = threading.Lock()
+        # the load in progress, shared by every coroutine that needs the model meanwhile
+        self._loading: Optional[asyncio.Future] = None
 
-    def start_chat(self) -> ChatSession:
-        return self.model.start_chat(response_validation=False)
+        # bounds the number of in-flight model calls for this client
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        # and how often a new one may start (0 = unlimited), to stay under the project quota
+        self.throttle = Throttle(max_qps, burst=max_concurrency)
+        # deadline, retries, circuit breaker and hedging for each call
+        self.policy = policy or CallPolicy()
+        # calls per day for this model, shared by every worker using the same store
+        self.quota = quota or RateLimiter(0)
+
+    @property
+    def model(self) -> 'GenerativeModel':
+        """ Loads the model on first access; blocks, so async code goes through load_model(). """
+        if self._model is None:
+            with self._model_lock:
+                if self._model is None:
+                    from vertexai.generative_models import GenerativeModel
+
+                    logger.info('Loading model: %s', self.model_name)
+                    self.vertex.initialize()
+                    self._model = GenerativeModel(self.model_name, safety_settings=safety_config())
+        return self._model
+
+    @model.setter
+    def model(self, generative_model: 'GenerativeModel'):
+        self._model = generative_model
+
+    async def load_model(self) -> 'GenerativeModel':
+        """ The model, loaded on a worker thread the first time; concurrent callers wait for the same load. """
+        if self._model is not None:
+            return self._model
+        if self._loading is None:
+            self._loading = asyncio.ensure_future(asyncio.to_thread(lambda: self.model))
+            # a failed load is not kept, the next caller tries again
+            self._loading.add_done_callback(self._loaded)
+        # shielded: a cancelled request must not cancel the load the others are waiting for
+        return await asyncio.shield(self._loading)
+
+    def _loaded(self, loading: asyncio.Future):
+        self._loading = None
+        if not loading.cancelled():
+            # retrieved here so a failure nobody awaited is not logged as never retrieved
+            loading.exception()
+
+    async def warm_up(self):
+        """ Loads vertexai and the model off the event loop, so the first request does not pay for it. """
+        await self.load_model()
+
+    async def start_chat(self) -> 'ChatSession':
+        model = await self.load_model()
+        return model.start_chat(response_validation=False)
 
     @staticmethod
-    def get_chat_response(chat: ChatSession, prompt: str) -> str:
+    def get_chat_response(chat: 'ChatSession', prompt: str) -> str:
         text_response = []
         responses = chat.send_message(prompt, generation_config=GENERATION_CONFIG, stream=True)
         for chunk in responses:
             text_response.append(chunk.text)
         return ''.join(text_response)
+
+    def _record_first_chunk(self, start: float):
+        seconds = time.perf_counter() - start
+        MODEL_FIRST_CHUNK_SECONDS.observe(seconds, model=self.model_name)
+        record_stage('model_first_chunk', seconds)
+
+    def _record_call(self, start: float, error: bool):
+        seconds = time.perf_counter() - start
+        MODEL_CALL_SECONDS.observe(seconds, model=self.model_name, outcome='error' if error else 'ok')
+        record_stage('model', seconds)
+
+    def _attempt_chats(self, chat: 'ChatSession') -> Callable[[], Awaitable['ChatSession']]:
+        # the first attempt uses the caller's chat; retries and hedges each get a fresh one
+        chats = iter([chat])
+
+        async def next_chat() -> 'ChatSession':
+            return next(chats, None) or await self.start_chat()
+        return next_chat
+
+    async def stream_chat_response(self, chat: 'ChatSession', prompt: str) -> AsyncIterator[str]:
+        """
+        Yields the response text chunk by chunk as the model produces it.
+        Opening the stream goes through the call policy; a failure after the
+        first chunk is not retried, since part of the answer is already out.
+        """
+        next_chat = self._attempt_chats(chat)
+
+        async def open_stream():
+            await self.quota.aincrement(self.model_name)
+            return await (await next_chat()).send_message_async(prompt, generation_config=GENERATION_CONFIG, stream=True)
+
+        async with self._semaphore:
+            await self.throttle.acquire()
+            start = time.perf_counter()
+            first_chunk = True
+            try:
+                responses = await self.policy.call(open_stream)
+                # the policy only bounds opening the stream; a stall after that must not hold the slot forever
+                async for chunk in self.policy.stream(responses):
+                    if first_chunk:
+                        self._record_first_chunk(start)
+                        first_chunk = False
+                    yield chunk.text
+            except BaseException:
+                self._record_call(start, error=True)
+                raise
+            self._record_call(start, error=False)
+
+    async def get_chat_response_async(self, chat: 'ChatSession', prompt: str) -> str:
+        collector = await self.get_chat_response_parsed(chat, prompt, _TextCollector)
+        return collector.text
+
+    async def get_chat_response_parsed(self, chat: 'ChatSession', prompt: str, parser_factory: Callable[[], P]) -> P:
+        """
+        Feeds the response to a fresh parser_factory() per attempt as it
+        streams in and returns the parser. An exception raised by the parser's
+        feed() aborts the call without a retry.
+        """
+        next_chat = self._attempt_chats(chat)
+
+        async def attempt() -> P:
+            parser = parser_factory()
+            # every attempt is billed, retries and hedges included
+            await self.quota.aincrement(self.model_name)
+            start = time.perf_counter()
+            first_chunk = True
+            try:
+                responses = await (await next_chat()).send_message_async(prompt, generation_config=GENERATION_CONFIG, stream=True)
+                async for chunk in responses:
+                    if first_chunk:
+                        self._record_first_chunk(start)
+                        first_chunk = False
+                    parser.feed(chunk.text)
+            except BaseException:
+                self._record_call(start, error=True)
+                raise
+            self._record_call(start, error=False)
+            return parser
+
+        async with self._semaphore:
+            await self.throttle.acquire()
+            # the deadline covers the whole response, so a stalled stream is retried too
+            return await self.policy.call(attempt)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'throttle': self.throttle.stats,
+            'calls': self.policy.stats,
+            'quota': {
+                'limit': self.quota.limit,
+                'usage': self.quota.usage(self.model_name),
+                'rejected': self.quota.rejected,
+            },
+        }
@@ -0,0 +1,309 @@
+import asyncio
+import json
+import logging
+import sqlite3
+import threading
+import time
+import uuid
+from datetime import datetime
+from typing import Any, AsyncIterator, Awaitable, Callable, Optional
+
+from pydantic import BaseModel
+
+from .db import connect, transaction
+from .model import JobKind, JobPriority, JobResponse, JobStatus
+
+logger = logging.getLogger(__name__)
+
+# lanes are served strictly in this order, oldest job first within a lane
+PRIORITY_ORDER = {
+    JobPriority.HIGH: 0,
+    JobPriority.NORMAL: 1,
+    JobPriority.LOW: 2,
+}
+
+TERMINAL_STATUSES = (JobStatus.DONE, JobStatus.FAILED)
+
+JobHandler = Callable[[dict], Awaitable[Any]]
+
+
+class JobError(Exception):
+    """ A failure whose message is safe to show to the client that submitted the job. """
+
+
+def _timestamp(value: Optional[float]) -> Optional[datetime]:
+    return datetime.fromtimestamp(value) if value is not None else None
+
+
+class JobQueue:
+    """
+    Durable queue of background jobs in a local SQLite database.
+
+    Submitted jobs are stored before the request returns, so queued work
+    survives a restart. A pool of worker tasks claims jobs by priority lane;
+    a claim is a lease of job_timeout seconds, and a job whose worker died
+    (its lease ran out) is picked up again, up to max_attempts times. The
+    database can be shared by several server processes on one host.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        handlers: dict[JobKind, JobHandler],
+        workers: int = 4,
+        job_timeout: float = 300.0,
+        max_attempts: int = 3,
+        retention: float = 86400.0,
+        poll_interval: float = 1.0,
+    ):
+        self.handlers = handlers
+        self.workers = workers
+        self.job_timeout = job_timeout
+        self.max_attempts = max_attempts
+        self.retention = retention
+        self.poll_interval = poll_interval
+
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS jobs ('
+            ' id TEXT PRIMARY KEY,'
+            ' kind TEXT NOT NULL,'
+            ' priority TEXT NOT NULL,'
+            ' lane INTEGER NOT NULL,'
+            ' status TEXT NOT NULL,'
+            ' payload TEXT NOT NULL,'
+            ' result TEXT,'
+            ' error TEXT,'
+            ' attempts INTEGER NOT NULL DEFAULT 0,'
+            ' created_at REAL NOT NULL,'
+            ' started_at REAL,'
+            ' finished_at REAL,'
+            ' lease_until REAL)'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS jobs_queue ON jobs (status, lane, created_at)')
+
+        self._tasks: list[asyncio.Task] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._wakeup: Optional[asyncio.Event] = None
+        self._changed: Optional[asyncio.Condition] = None
+        self._closing = False
+
+        self.completed = 0
+        self.failed = 0
+        self.reclaimed = 0
+        self.store_errors = 0
+        self.restarted = 0
+
+    # ------------------------------------------------------------
+    # storage
+    # ------------------------------------------------------------
+    def _row_to_response(self, row: tuple) -> JobResponse:
+        job_id, kind, priority, status, result, error, created_at, started_at, finished_at = row
+        return JobResponse(
+            id=job_id,
+            kind=kind,
+            priority=priority,
+            status=status,
+            created_at=_timestamp(created_at),
+            started_at=_timestamp(started_at),
+            finished_at=_timestamp(finished_at),
+            result=json.loads(result) if result is not None else None,
+            error=error,
+        )
+
+    def get(self, job_id: str) -> Optional[JobResponse]:
+        with self._lock:
+            row = self._conn.execute(
+                'SELECT id, kind, priority, status, result, error, created_at, started_at, finished_at'
+                ' FROM jobs WHERE id = ?',
+                (job_id,)
+            ).fetchone()
+        return self._row_to_response(row) if row else None
+
+    def submit(self, kind: JobKind, payload: dict, priority: JobPriority = JobPriority.NORMAL) -> JobResponse:
+        job_id = uuid.uuid4().hex
+        with self._lock:
+            self._conn.execute(
+                'INSERT INTO jobs (id, kind, priority, lane, status, payload, created_at) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                (job_id, kind.value, priority.value, PRIORITY_ORDER[priority], JobStatus.QUEUED.value,
+                 json.dumps(payload), time.time())
+            )
+        # submit() runs in FastAPI's threadpool, and an asyncio.Event may only be set from its loop
+        if self._loop is not None and not self._loop.is_closed():
+            self._loop.call_soon_threadsafe(self._wakeup.set)
+        return self.get(job_id)
+
+    def _claim(self) -> Optional[tuple[str, str, dict]]:
+        now = time.time()
+        with self._lock, transaction(self._conn):
+            # running jobs whose lease ran out belonged to a worker that died
+            expired = self._conn.execute(
+                'UPDATE jobs SET status = ?, finished_at = ?, error = ?'
+                ' WHERE status = ? AND lease_until <= ? AND attempts >= ?',
+                (JobStatus.FAILED.value, now, 'Job did not finish', JobStatus.RUNNING.value, now,
+                 self.max_attempts)
+            ).rowcount
+            row = self._conn.execute(
+                'SELECT id, kind, payload, status FROM jobs'
+                ' WHERE status = ? OR (status = ? AND lease_until <= ?)'
+                ' ORDER BY lane, created_at LIMIT 1',
+                (JobStatus.QUEUED.value, JobStatus.RUNNING.value, now)
+            ).fetchone()
+            if row is not None:
+                self._conn.execute(
+                    'UPDATE jobs SET status = ?, attempts = attempts + 1, started_at = ?, lease_until = ?'
+                    ' WHERE id = ?',
+                    (JobStatus.RUNNING.value, now, now + self.job_timeout, row[0])
+                )
+
+        self.failed += expired
+        if row is None:
+            return None
+        job_id, kind, payload, status = row
+        if status == JobStatus.RUNNING.value:
+            self.reclaimed += 1
+        return job_id, kind, json.loads(payload)
+
+    def _finish(self, job_id: str, result: Any = None, error: Optional[str] = None):
+        status = JobStatus.FAILED if error is not None else JobStatus.DONE
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                'UPDATE jobs SET status = ?, result = ?, error = ?, finished_at = ?, lease_until = NULL WHERE id = ?',
+                (status.value, json.dumps(result) if error is None else None, error, now, job_id)
+            )
+            # finished jobs are kept for `retention` seconds so clients can fetch the result
+            self._conn.execute(
+                'DELETE FROM jobs WHERE status IN (?, ?) AND finished_at <= ?',
+                (JobStatus.DONE.value, JobStatus.FAILED.value, now - self.retention)
+            )
+
+    def _counts(self) -> dict:
+        with self._lock:
+            rows = self._conn.execute('SELECT status, COUNT(*) FROM jobs GROUP BY status').fetchall()
+        return dict(rows)
+
+    # ------------------------------------------------------------
+    # workers
+    # ------------------------------------------------------------
+    async def _notify(self):
+        async with self._changed:
+            self._changed.notify_all()
+
+    async def _try_finish(self, job_id: str, result: Any = None, error: Optional[str] = None) -> bool:
+        try:
+            await asyncio.to_thread(self._finish, job_id, result, error)
+            return True
+        except sqlite3.Error as e:
+            # the job stays running; once its lease runs out it is claimed and run again
+            self.store_errors += 1
+            logger.error('Could not record the outcome of job %s: %s', job_id, e)
+            return False
+
+    async def _run(self, job_id: str, kind: str, payload: dict):
+        try:
+            result = await asyncio.wait_for(self.handlers[JobKind(kind)](payload), self.job_timeout)
+            if isinstance(result, BaseModel):
+                result = result.model_dump(mode='json')
+            if await self._try_finish(job_id, result=result):
+                self.completed += 1
+        except asyncio.CancelledError:
+            # shutting down: leave the job running, its lease expires and it is picked up again
+            raise
+        except Exception as e:
+            if isinstance(e, JobError):
+                error = str(e)
+            elif isinstance(e, asyncio.TimeoutError):
+                error = 'Job timed out'
+            else:
+                logger.exception('Job %s (%s) failed: %s', job_id, kind, str(e))
+                error = 'Job failed'
+            if await self._try_finish(job_id, error=error):
+                self.failed += 1
+
+    async def _worker(self):
+        while True:
+            try:
+                # the claim may wait up to the connection timeout for another process's write lock
+                claimed = await asyncio.to_thread(self._claim)
+            except sqlite3.Error as e:
+                # e.g. 'database is locked' with several processes sharing the file: back off and try again
+                self.store_errors += 1
+                logger.error('Could not claim a job: %s', e)
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if claimed is None:
+                self._wakeup.clear()
+                try:
+                    # also polls, for jobs submitted by other processes sharing the database
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            job_id, kind, payload = claimed
+            await self._notify()
+            await self._run(job_id, kind, payload)
+            await self._notify()
+
+    def _start_worker(self) -> asyncio.Task:
+        task = asyncio.create_task(self._worker())
+        task.add_done_callback(self._worker_done)
+        return task
+
+    def _worker_done(self, task: asyncio.Task):
+        if self._closing or task.cancelled():
+            return
+        # a worker only ends on an unexpected error; replace it so the pool keeps its size
+        logger.error('Job worker died, restarting it', exc_info=task.exception())
+        self.restarted += 1
+        self._tasks[self._tasks.index(task)] = self._start_worker()
+
+    def start(self):
+        self._closing = False
+        self._loop = asyncio.get_running_loop()
+        self._wakeup = asyncio.Event()
+        self._changed = asyncio.Condition()
+        self._tasks = [self._start_worker() for _ in range(self.workers)]
+
+    async def close(self):
+        self._closing = True
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        with self._lock:
+            self._conn.close()
+
+    async def watch(self, job_id: str) -> AsyncIterator[JobResponse]:
+        """ Yields the job every time its status changes, until it is done or failed. """
+        last_status = None
+        while True:
+            job = await asyncio.to_thread(self.get, job_id)
+            if job is None:
+                return
+            if job.status != last_status:
+                last_status = job.status
+                yield job
+            if job.status in TERMINAL_STATUSES:
+                return
+
+            try:
+                async with self._changed:
+                    await asyncio.wait_for(self._changed.wait(), self.poll_interval)
+            except asyncio.TimeoutError:
+                pass
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'workers': sum(not task.done() for task in self._tasks),
+            'completed': self.completed,
+            'failed': self.failed,
+            'reclaimed': self.reclaimed,
+            'store_errors': self.store_errors,
+            'restarted': self.restarted,
+            'jobs': self._counts(),
+        }
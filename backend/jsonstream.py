@@ -0,0 +1,120 @@
+import re
+from typing import Any
+
+from pydantic_core import from_json
+
+# what may come before the object: a markdown code fence, possibly still arriving ("`", "``", "```json")
+LEAD = re.compile(r'`{1,3}[a-zA-Z]*\s*')
+MAX_LEAD = 32
+
+
+class InvalidJsonPrefix(ValueError):
+    """ The output cannot be a JSON object, no need to wait for the rest of it. """
+
+
+class JsonStreamParser:
+    """
+    Consumes a model's JSON output chunk by chunk as it streams in.
+
+    Text before the object is checked as it arrives: whitespace and a code
+    fence are skipped, anything else (prose, a bare value) raises
+    InvalidJsonPrefix so the caller can stop paying for the stream. Bracket
+    depth is tracked outside strings, so the parser knows where the
+    top-level object ends and ignores whatever follows it (a closing fence,
+    a remark).
+
+    value() parses the object and, when strict parsing fails, repairs
+    trailing commas and closes a truncated object (open strings, arrays and
+    braces) before giving up. `repaired` tells whether that was needed.
+    """
+
+    def __init__(self):
+        self._lead: list[str] = []
+        self._parts: list[str] = []
+        self._length = 0
+        # offsets in the object's text of the commas outside strings, for the trailing comma repair
+        self._commas: list[int] = []
+        self._depth = 0
+        self._in_string = False
+        self._escape = False
+        self.started = False
+        self.complete = False
+        self.trailing_chars = 0
+        self.repaired = False
+
+    def _check_lead(self):
+        lead = ''.join(self._lead).lstrip()
+        if lead and (len(lead) > MAX_LEAD or not LEAD.fullmatch(lead)):
+            raise InvalidJsonPrefix(f'Model output does not start with a JSON object: {lead[:MAX_LEAD]!r}')
+
+    def feed(self, chunk: str):
+        if self.complete:
+            self.trailing_chars += len(chunk)
+            return
+
+        start = 0
+        if not self.started:
+            brace = chunk.find('{')
+            self._lead.append(chunk if brace < 0 else chunk[:brace])
+            self._check_lead()
+            if brace < 0:
+                return
+            self.started = True
+            start = brace
+
+        for i in range(start, len(chunk)):
+            char = chunk[i]
+            if self._in_string:
+                if self._escape:
+                    self._escape = False
+                elif char == '\\':
+                    self._escape = True
+                elif char == '"':
+                    self._in_string = False
+            elif char == '"':
+                self._in_string = True
+            elif char == ',':
+                self._commas.append(self._length + i - start)
+            elif char in '{[':
+                self._depth += 1
+            elif char in '}]':
+                self._depth -= 1
+                if self._depth == 0:
+                    self._append(chunk[start:i + 1])
+                    self.complete = True
+                    self.trailing_chars += len(chunk) - i - 1
+                    return
+
+        self._append(chunk[start:])
+
+    def _append(self, part: str):
+        self._parts.append(part)
+        self._length += len(part)
+
+    def _without_trailing_commas(self, text: str) -> str:
+        # a comma right before a closing bracket, which strict JSON rejects; commas inside strings are text
+        pieces, last = [], 0
+        for offset in self._commas:
+            end = offset + 1
+            while end < len(text) and text[end].isspace():
+                end += 1
+            if end < len(text) and text[end] in '}]':
+                pieces.append(text[last:offset])
+                last = offset + 1
+        pieces.append(text[last:])
+        return ''.join(pieces)
+
+    def value(self) -> Any:
+        if not self.started:
+            raise ValueError('Model output contains no JSON object')
+
+        text = ''.join(self._parts)
+        if self.complete:
+            try:
+                return from_json(text)
+            except ValueError:
+                pass
+
+        self.repaired = True
+        # allow_partial closes whatever a truncated stream left open
+        return from_json(self._without_trailing_commas(text), allow_partial='trailing-strings')
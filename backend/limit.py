@@ -1,32 +1,167 @@
-from datetime import date
+import math
+import threading
+import time
+from abc import ABC, abstractmethod
+from datetime import datetime
+from typing import Optional
+
 from fastapi import HTTPException, status
 
+from .db import connect, run_blocking, transaction
+from .model import LimitResponse
+
+DAY = 86400.0
+
+
+class BucketStore(ABC):
+    """
+    Token buckets keyed by name. A bucket holds up to `capacity` tokens and
+    refills continuously at `rate` tokens per second; taking is atomic, so
+    concurrent callers (threads, or processes sharing the store) never
+    overdraw a bucket. Implement this for an external store (Redis, ...) to
+    share quotas across hosts.
+    """
+
+    # whether calls can wait on I/O or locks, see db.run_blocking
+    blocking = True
+
+    @abstractmethod
+    def take(self, key: str, capacity: float, rate: float, cost: float) -> bool:
+        """ Takes `cost` tokens if the bucket holds that many; returns whether it did. """
+
+    @abstractmethod
+    def peek(self, key: str, capacity: float, rate: float) -> tuple[float, float]:
+        """ Returns (tokens, last update time) without taking any. """
+
+    def close(self):
+        pass
+
+
+def _refill(tokens: float, updated_at: float, capacity: float, rate: float, now: float) -> float:
+    return min(capacity, tokens + max(0.0, now - updated_at) * rate)
+
+
+class MemoryBucketStore(BucketStore):
+    """ Per-process buckets, for a single worker. """
+
+    blocking = False
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._buckets: dict[str, tuple[float, float]] = {}
+
+    def _current(self, key: str, capacity: float, rate: float, now: float) -> float:
+        tokens, updated_at = self._buckets.get(key, (capacity, now))
+        return _refill(tokens, updated_at, capacity, rate, now)
+
+    def take(self, key: str, capacity: float, rate: float, cost: float) -> bool:
+        now = time.time()
+        with self._lock:
+            tokens = self._current(key, capacity, rate, now)
+            allowed = tokens >= cost
+            self._buckets[key] = (tokens - cost if allowed else tokens, now)
+        return allowed
+
+    def peek(self, key: str, capacity: float, rate: float) -> tuple[float, float]:
+        now = time.time()
+        with self._lock:
+            updated_at = self._buckets.get(key, (capacity, now))[1]
+            return self._current(key, capacity, rate, now), updated_at
+
+
+class SQLiteBucketStore(BucketStore):
+    """ Buckets in a local SQLite database, shared by every worker process on the host. """
+
+    def __init__(self, path: str):
+        self._lock = threading.Lock()
+        self._conn = connect(path)
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS buckets ('
+            ' key TEXT PRIMARY KEY,'
+            ' tokens REAL NOT NULL,'
+            ' updated_at REAL NOT NULL)'
+        )
+
+    def _current(self, key: str, capacity: float, rate: float, now: float) -> tuple[float, float]:
+        row = self._conn.execute('SELECT tokens, updated_at FROM buckets WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return capacity, now
+        tokens, updated_at = row
+        return _refill(tokens, updated_at, capacity, rate, now), updated_at
+
+    def take(self, key: str, capacity: float, rate: float, cost: float) -> bool:
+        now = time.time()
+        # read-refill-write in one transaction, so workers sharing the file never overdraw
+        with self._lock, transaction(self._conn):
+            tokens, _ = self._current(key, capacity, rate, now)
+            allowed = tokens >= cost
+            self._conn.execute(
+                'INSERT OR REPLACE INTO buckets (key, tokens, updated_at) VALUES (?, ?, ?)',
+                (key, tokens - cost if allowed else tokens, now)
+            )
+        return allowed
+
+    def peek(self, key: str, capacity: float, rate: float) -> tuple[float, float]:
+        with self._lock:
+            return self._current(key, capacity, rate, time.time())
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def create_bucket_store(backend: str, path: str) -> BucketStore:
+    if backend == 'sqlite':
+        return SQLiteBucketStore(path)
+    if backend == 'memory':
+        return MemoryBucketStore()
+    raise ValueError(f'Unknown limit backend: {backend}')
+
+
 class RateLimiter:
+    """
+    Quota of `limit` units per `period` seconds for each key (a client, a
+    model), as a token bucket: the allowance refills continuously instead of
+    resetting at midnight, and a full bucket allows a burst of `limit`.
+    A limit of 0 disables the limiter.
+    """
 
-    def __init__(self, limit: int):
+    def __init__(self, limit: int, store: Optional[BucketStore] = None, period: float = DAY, name: str = 'requests'):
         self.limit = limit
-        self.requests = 0
-        self.last_reset = date.today()
-
-    def check_and_update(self):
-        current_date = date.today()
-        if current_date > self.last_reset:
-            self.requests = 0
-            self.last_reset = current_date
-
-    def increment(self):
-        self.check_and_update()
-        if self.requests >= self.limit:
+        self.store = store or MemoryBucketStore()
+        self.period = period
+        self.name = name
+        self.rejected = 0
+
+    @property
+    def rate(self) -> float:
+        return self.limit / self.period
+
+    def _key(self, key: str) -> str:
+        return f'{self.name}:{key}'
+
+    def increment(self, key: str = 'global', cost: int = 1):
+        if self.limit <= 0:
+            return
+        if not self.store.take(self._key(key), self.limit, self.rate, cost):
+            self.rejected += 1
             raise HTTPException(
                 status_code=status.HTTP_429_TOO_MANY_REQUESTS,
-                detail="Daily limit reached, please try again tomorrow"
+                detail="Daily limit reached, please try again later"
             )
-        self.requests += 1
 
-    @property
-    def usage(self):
-        return self.requests
+    async def aincrement(self, key: str = 'global', cost: int = 1):
+        await run_blocking(self.limit > 0 and self.store.blocking, self.increment, key, cost)
 
-    @property
-    def last_reset_iso(self):
-        return self.last_reset.isoformat()
+    def usage(self, key: str = 'global') -> int:
+        tokens, _ = self.store.peek(self._key(key), self.limit, self.rate)
+        return max(0, self.limit - math.floor(tokens))
+
+    def status(self, key: str = 'global') -> LimitResponse:
+        tokens, updated_at = self.store.peek(self._key(key), self.limit, self.rate)
+        return LimitResponse(
+            limit=self.limit,
+            usage=max(0, self.limit - math.floor(tokens)),
+            # when the bucket was last drawn from; it has been refilling since
+            last_reset=datetime.fromtimestamp(updated_at).isoformat()
+        )
@@ -0,0 +1,195 @@
+import json
+import logging
+import logging.handlers
+import queue
+import threading
+import time
+import uuid
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Optional
+
+# id of the request being handled, attached to every record logged while handling it
+request_id_var: ContextVar[Optional[str]] = ContextVar('request_id', default=None)
+
+CONSOLE_FORMAT = '%(asctime)s:%(name)s:%(request_id)s:%(message)s'
+
+
+class RequestIdFilter(logging.Filter):
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        record.request_id = request_id_var.get()
+        return True
+
+
+class ErrorSampler(logging.Filter):
+    """
+    Lets through the first `burst` warnings and errors with the same logger,
+    message template and exception type per `window` seconds and drops the
+    rest, so an outage logs a handful of tracebacks instead of one per
+    request. The first record let through in the next window carries the
+    number dropped as `suppressed`.
+
+    Keys whose window has ended are forgotten, and at most `max_keys` are
+    tracked, so messages that differ every time cannot grow it without bound.
+    """
+
+    def __init__(self, window: float = 60.0, burst: int = 5, max_keys: int = 1000):
+        super().__init__()
+        self.window = window
+        self.burst = burst
+        self.max_keys = max_keys
+        self._lock = threading.Lock()
+        # key -> [window start, records seen in the window, suppressed since the last one let through],
+        # in order of window start
+        self._seen: dict[tuple, list] = {}
+        self.suppressed = 0
+
+    def _evict(self, now: float):
+        # oldest window first: stop at the first one still open (their suppressed counts stay in the total)
+        while self._seen:
+            key, entry = next(iter(self._seen.items()))
+            if now - entry[0] < self.window and len(self._seen) < self.max_keys:
+                break
+            del self._seen[key]
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno < logging.WARNING or self.window <= 0:
+            return True
+
+        exc_type = record.exc_info[0].__name__ if record.exc_info and record.exc_info[0] else None
+        key = (record.name, record.msg, exc_type)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._seen.get(key)
+            if entry is None or now - entry[0] >= self.window:
+                suppressed = entry[2] if entry else 0
+                self._seen.pop(key, None)
+                self._evict(now)
+                self._seen[key] = [now, 1, 0]
+                if suppressed:
+                    record.suppressed = suppressed
+                return True
+            entry[1] += 1
+            if entry[1] <= self.burst:
+                return True
+            entry[2] += 1
+            self.suppressed += 1
+            return False
+
+
+class JsonFormatter(logging.Formatter):
+    """ One JSON object per line: time, level, logger, message, request id, and the traceback if any. """
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            'time': datetime.fromtimestamp(record.created, timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'request_id': getattr(record, 'request_id', None),
+        }
+        if getattr(record, 'suppressed', None):
+            entry['suppressed'] = record.suppressed
+        if record.exc_info:
+            entry['exception'] = self.formatException(record.exc_info)
+        elif record.exc_text:
+            entry['exception'] = record.exc_text
+        return json.dumps(entry, ensure_ascii=False)
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # only resolve the message here, in case its arguments change later;
+        # formatting (tracebacks included) happens on the writer thread
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+def setup_logging(
+    logger_name: str = 'backend',
+    level: str = 'INFO',
+    path: str = '',
+    json_format: bool = True,
+    max_bytes: int = 10485760,
+    backup_count: int = 5,
+    rotate_when: str = '',
+    console: bool = True,
+    error_sample_window: float = 60.0,
+    error_sample_burst: int = 5,
+) -> logging.handlers.QueueListener:
+    """
+    Routes `logger_name` and its children through a queue to a background
+    writer thread, so logging on the request path never waits on the disk
+    or the console. The file, if `path` is set, is rotated by size, or by
+    time when `rotate_when` is given (see TimedRotatingFileHandler). Returns
+    the started listener; stop() it at shutdown to flush the queue.
+    """
+    handlers: list[logging.Handler] = []
+    if path:
+        if rotate_when:
+            file_handler = logging.handlers.TimedRotatingFileHandler(
+                path, when=rotate_when, backupCount=backup_count, encoding='utf-8'
+            )
+        else:
+            file_handler = logging.handlers.RotatingFileHandler(
+                path, maxBytes=max_bytes, backupCount=backup_count, encoding='utf-8'
+            )
+        file_handler.setFormatter(JsonFormatter() if json_format else logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(file_handler)
+    if console:
+        stream_handler = logging.StreamHandler()
+        stream_handler.setFormatter(logging.Formatter(CONSOLE_FORMAT))
+        handlers.append(stream_handler)
+
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+    queue_handler = _QueueHandler(log_queue)
+    # filters run on the caller's thread, where the request's context is
+    queue_handler.addFilter(RequestIdFilter())
+    queue_handler.addFilter(ErrorSampler(error_sample_window, error_sample_burst))
+
+    logger = logging.getLogger(logger_name)
+    for handler in list(logger.handlers):
+        if isinstance(handler, logging.handlers.QueueHandler):
+            logger.removeHandler(handler)
+    logger.addHandler(queue_handler)
+    logger.setLevel(level)
+    # the queue is the only way out, so nothing is written on the caller's thread
+    logger.propagate = False
+
+    listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=True)
+    listener.start()
+    return listener
+
+
+class RequestIdMiddleware:
+    """
+    Gives each request an id, taken from the X-Request-ID header when the
+    client or a proxy sends one, for the logs written while handling it,
+    and returns it in the X-Request-ID response header.
+    """
+
+    HEADER = b'x-request-id'
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        request_id = dict(scope['headers']).get(self.HEADER, b'').decode('latin-1')[:128] or uuid.uuid4().hex
+        token = request_id_var.set(request_id)
+
+        async def send_with_id(message):
+            if message['type'] == 'http.response.start':
+                message = {**message, 'headers': [*message.get('headers', []), (self.HEADER, request_id.encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_id)
+        finally:
+            request_id_var.reset(token)
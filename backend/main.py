@@ -1,25 +1,82 @@
+import asyncio
 from fastapi import FastAPI
 import logging
 from functools import lru_cache
-from cachetools import TTLCache
 from .config import Settings
-from .gemini import GeminiClient
-from google.oauth2 import service_account
-from google.oauth2.service_account import Credentials
+from .gemini import GeminiClient, VertexSession
 
+from .batch import map_unique, merge
 from .bias import BiasAnalyzer
+from .browser import BrowserPool
+from .cache import TypedCache, create_cache
+from .fake import FakeGenerativeModel
+from .fetch import Fetcher
+from .jobs import JobError, JobHandler, JobQueue
+from .limit import RateLimiter, create_bucket_store
+from .logs import RequestIdMiddleware, setup_logging
+from .metrics import REGISTRY, ServerTimingMiddleware
 from .parse import WebParser
+from .resilience import RETRYABLE_ERRORS, CallPolicy, CircuitBreaker, CircuitOpenError
+from .routing import ModelRouter, RoutingPolicy
+from .stats import LatencyStats
+from .textmetrics import LocalMetrics
+from .uri import canonicalize_uri
 
 import logging
 from functools import lru_cache
 
 
-from fastapi import Body, HTTPException, status
-from .model import AnalyzeRequest, AnalyzeResponse, AnalyzeResult
+from fastapi import Body, Depends, HTTPException, Request, status
+from fastapi.responses import PlainTextResponse, StreamingResponse
+from .model import (
+    AnalyzeRequest,
+    AnalyzeResponse,
+    AnalyzeResult,
+    BatchAnalyzeItem,
+    BatchAnalyzeRequest,
+    EnhancedTextRequest,
+    FetchStrategy,
+    JobKind,
+    JobRequest,
+    JobResponse,
+    LimitResponse,
+)
+from pydantic import BaseModel, ValidationError
+from typing import Any, AsyncIterator, Optional
+import json
+import time
 
 from fastapi.middleware.cors import CORSMiddleware
-
-app = FastAPI()
+from contextlib import asynccontextmanager
+
+
+async def _warm_up():
+    # heavy libraries and the Vertex AI clients load in the background, the app serves meanwhile
+    results = await asyncio.gather(
+        local_metrics.warm_up(),
+        gemini_client.warm_up(),
+        gemini_client2.warm_up(),
+        return_exceptions=True
+    )
+    for result in results:
+        if isinstance(result, Exception):
+            logger.error('Warm-up failed: %s', result)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    job_queue.start()
+    warm_up = asyncio.ensure_future(_warm_up())
+    yield
+    warm_up.cancel()
+    await job_queue.close()
+    local_metrics.close()
+    await browser_pool.close()
+    await fetcher.aclose()
+    limit_store.close()
+    log_listener.stop()
+
+
+app = FastAPI(lifespan=lifespan)
 
 app.add_middleware(
     CORSMiddleware,
@@ -30,20 +87,7 @@ app.add_middleware(
 )
 
 
-#setting up logging
 logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-formatter = logging.Formatter('%(asctime)s:%(name)s:%(message)s')
-
-file_handler = logging.FileHandler('main.log')
-file_handler.setFormatter(formatter)
-
-stream_handler = logging.StreamHandler()
-stream_handler.setFormatter(formatter)
-
-logger.addHandler(file_handler)
-logger.addHandler(stream_handler)
 
 
 
@@ -53,101 +97,307 @@ def get_settings() -> Settings:
 
 settings: Settings = get_settings()
 
-credentials: Credentials = service_account.Credentials.from_service_account_file(settings.gcp_service_account_file)
+# every backend.* logger writes through one queue and a background thread
+log_listener = setup_logging(
+    level=settings.log_level,
+    path=settings.log_path,
+    json_format=settings.log_json,
+    max_bytes=settings.log_max_bytes,
+    backup_count=settings.log_backup_count,
+    rotate_when=settings.log_rotate_when,
+    console=settings.log_console,
+    error_sample_window=settings.log_error_sample_window,
+    error_sample_burst=settings.log_error_sample_burst
+)
+
+if settings.metrics_server_timing:
+    app.add_middleware(ServerTimingMiddleware)
+
+# outermost, so everything below logs with the request's id
+app.add_middleware(RequestIdMiddleware)
+
+if settings.gemini_backend not in ('vertex', 'fake'):
+    raise ValueError(f'Unknown Gemini backend: {settings.gemini_backend}')
+
+# the fake backend answers in-process, for benchmarks and local runs without Vertex AI;
+# with Vertex, credentials are loaded and vertexai initialized once, on first use
+vertex_session: Optional[VertexSession] = (
+    VertexSession(settings.gcp_project_id, settings.gcp_location, settings.gcp_service_account_file)
+    if settings.gemini_backend == 'vertex' else None
+)
+
+def _fake_model() -> Optional[FakeGenerativeModel]:
+    if settings.gemini_backend != 'fake':
+        return None
+    return FakeGenerativeModel(
+        latency=settings.fake_latency,
+        tail_latency=settings.fake_tail_latency,
+        tail_rate=settings.fake_tail_rate,
+        error_rate=settings.fake_error_rate,
+        chunk_size=settings.fake_chunk_size,
+        chunk_delay=settings.fake_chunk_delay,
+        seed=settings.fake_seed
+    )
+
+def _call_policy() -> CallPolicy:
+    # one per client, so an outage of one model does not trip the other's breaker
+    return CallPolicy(
+        timeout=settings.model_timeout,
+        max_retries=settings.model_max_retries,
+        backoff=settings.model_backoff,
+        max_backoff=settings.model_max_backoff,
+        hedge_after=settings.model_hedge_after,
+        breaker=CircuitBreaker(settings.model_breaker_failures, settings.model_breaker_reset)
+    )
+
+# token buckets shared by all workers: per client (requests/day) and per model (calls/day)
+limit_store = create_bucket_store(settings.limit_backend, settings.limit_path)
+client_limiter: RateLimiter = RateLimiter(settings.daily_limit, limit_store, name='client')
 
 gemini_client: GeminiClient = GeminiClient(
-    settings.gcp_project_id,
-    settings.gcp_location,
-    credentials,
-    settings.gcp_gemini_model
+    vertex_session,
+    settings.gcp_gemini_model,
+    settings.model_concurrency,
+    settings.model_qps,
+    _call_policy(),
+    generative_model=_fake_model(),
+    quota=RateLimiter(settings.model_daily_limit, limit_store, name='model')
 )
 
 gemini_client2: GeminiClient = GeminiClient(
-    settings.gcp_project_id,
-    settings.gcp_location,
-    credentials,
-    settings.gcp_gemini_model2
+    vertex_session,
+    settings.gcp_gemini_model2,
+    settings.model_concurrency,
+    settings.model_qps,
+    _call_policy(),
+    generative_model=_fake_model(),
+    quota=RateLimiter(settings.model_daily_limit2, limit_store, name='model')
 )
 
-bias_analyzer: BiasAnalyzer = BiasAnalyzer(gemini_client)
-bias_analyzer2: BiasAnalyzer = BiasAnalyzer(gemini_client2)
+def _create_cache(namespace: str, value_type: type) -> TypedCache:
+    return create_cache(settings.cache_backend, namespace, value_type, settings.cache_size, settings.cache_ttl, settings.cache_path)
 
-web_parser: WebParser = WebParser(settings.parse_max_content_length, settings.parse_chunk_size, use_selenium=False)
+# sentiment / readability, shared by both analyzers so a text is only scored once
+local_metrics: LocalMetrics = LocalMetrics(
+    settings.metrics_process_threshold,
+    settings.metrics_workers,
+    settings.metrics_cache_size
+)
 
+# analyses keyed on page text + model + template, shared by both analyzers
+analysis_cache: TypedCache[AnalyzeResult] = _create_cache('analysis', AnalyzeResult)
+
+bias_analyzer: BiasAnalyzer = BiasAnalyzer(
+    gemini_client,
+    analysis_cache,
+    settings.gcp_gemini_prompt_tokens,
+    settings.template_auto_reload,
+    settings.analysis_chunk_tokens,
+    settings.analysis_chunk_concurrency,
+    local_metrics
+)
+bias_analyzer2: BiasAnalyzer = BiasAnalyzer(
+    gemini_client2,
+    analysis_cache,
+    settings.gcp_gemini_prompt_tokens2,
+    settings.template_auto_reload,
+    settings.analysis_chunk_tokens,
+    settings.analysis_chunk_concurrency,
+    local_metrics
+)
 
+# first-pass analyses go to Flash, escalated to Pro only when the policy asks for it
+model_router: ModelRouter = ModelRouter(
+    bias_analyzer,
+    bias_analyzer2,
+    RoutingPolicy(
+        cascade=settings.routing_cascade,
+        escalate_on_invalid=settings.routing_escalate_on_invalid,
+        borderline_low=settings.routing_borderline_low,
+        borderline_high=settings.routing_borderline_high,
+        long_text_tokens=settings.routing_long_text_tokens
+    )
+)
 
+fetcher: Fetcher = Fetcher(
+    connect_timeout=settings.fetch_connect_timeout,
+    read_timeout=settings.fetch_read_timeout,
+    max_retries=settings.fetch_max_retries,
+    backoff=settings.fetch_backoff,
+    per_host_concurrency=settings.fetch_per_host_concurrency,
+    max_connections=settings.fetch_max_connections
+)
 
-result_cache: TTLCache = TTLCache(maxsize=settings.cache_size, ttl=settings.cache_ttl)
-enhanced_result_cache: TTLCache = TTLCache(maxsize=settings.cache_size, ttl=settings.cache_ttl)
-pro_version_analysis: TTLCache = TTLCache(maxsize=settings.cache_size, ttl=settings.cache_ttl)
+browser_pool: BrowserPool = BrowserPool(
+    size=settings.browser_pool_size,
+    max_pages=settings.browser_max_pages,
+    render_timeout=settings.browser_render_timeout,
+    network_idle_time=settings.browser_network_idle_time,
+    driver_path=settings.browser_driver_path,
+    driver_retry_after=settings.browser_driver_retry_after
+)
 
-@app.post('/analyze')
-def analyze(analyze_request: AnalyzeRequest) -> AnalyzeResponse:
+web_parser: WebParser = WebParser(
+    settings.parse_max_content_length,
+    settings.parse_chunk_size,
+    default_strategy=settings.parse_default_strategy,
+    min_text_length=settings.parse_min_text_length,
+    max_concurrency=settings.fetch_concurrency,
+    cache_size=settings.parse_cache_size,
+    cache_ttl=settings.parse_cache_ttl,
+    fetcher=fetcher,
+    browser_pool=browser_pool,
+    extractor=settings.parse_extractor
+)
+
+
+
+
+result_cache: TypedCache[AnalyzeResponse] = _create_cache('analyze', AnalyzeResponse)
+enhanced_result_cache: TypedCache[str] = _create_cache('enhance', str)
+pro_version_analysis: TypedCache[AnalyzeResult] = _create_cache('analyze_enhanced', AnalyzeResult)
+
+def _client_key(request: Request) -> str:
+    # behind a proxy, the header it sets with the real client address
+    if settings.limit_client_header:
+        key = request.headers.get(settings.limit_client_header)
+        if key:
+            return key.split(',')[0].strip()
+    return request.client.host if request.client else 'unknown'
+
+# charges every request; endpoints with a result cache charge on a miss only, through _charge.
+# A plain def: FastAPI runs it in its threadpool, so the store's lock is never awaited on the event loop
+def rate_limit(request: Request):
+    client_limiter.increment(_client_key(request))
+
+async def _charge(client: Optional[str]):
+    # None: the caller was already charged (a job, a batch of texts)
+    if client is not None:
+        await client_limiter.aincrement(client)
+
+def _model_error(error: Exception, detail: str) -> HTTPException:
+    # a model's daily quota is used up
+    if isinstance(error, HTTPException):
+        return error
+    # the model backend is down or overloaded even after retries: tell the client to come back later
+    if isinstance(error, (CircuitOpenError, *RETRYABLE_ERRORS)):
+        return HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail='Model temporarily unavailable')
+    return HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=detail)
+
+async def _analyze_uri(uri: str, strategy: Optional[FetchStrategy] = None, client: Optional[str] = None) -> AnalyzeResponse:
     # try to use cached result
-    cached_result = result_cache.get(analyze_request.uri)
+    # entries written with an older AnalyzeResult schema are never returned
+    cache_key = canonicalize_uri(uri)
+    cached_result = await result_cache.aget(cache_key)
 
-    # --- FIX OLD CACHE ITEMS THAT DO NOT HAVE NEW FIELDS ---
-    if cached_result:
-        result = cached_result.result
-        if (
-            not hasattr(result, "sentiment_score")
-            or not hasattr(result, "readability_score")
-            or not hasattr(result, "readability_level")
-        ):
-            logger.info("Old cached item detected — ignoring cache for %s", analyze_request.uri)
-            cached_result = None
-
-    # If still valid, return cached result
     if cached_result:
-        logger.info('Returning cached result for %s', analyze_request.uri)
+        logger.info('Returning cached result for %s', uri)
         return cached_result
 
+    await _charge(client)
 
-
-    logger.info('Analyzing %s', analyze_request.uri)
-    text = web_parser.parse(analyze_request.uri)
+    logger.info('Analyzing %s', uri)
+    text = await web_parser.parse(uri, strategy, model_router.text_token_budget)
 
     if not text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Could not parse page')
 
     try:
-        result = bias_analyzer2.analyze(text)
-        response = AnalyzeResponse(uri=analyze_request.uri, result=result)
-        result_cache[analyze_request.uri] = response
+        result = await model_router.analyze(text)
+        response = AnalyzeResponse(uri=uri, result=result)
+        await result_cache.store(cache_key, response)
         return response
     
     except Exception as e:
-        logger.exception("Failed to analyze %s: %s", analyze_request.uri, str(e))
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='Could not analyze page')
+        logger.exception("Failed to analyze %s: %s", uri, str(e))
+        raise _model_error(e, 'Could not analyze page')
 
-@app.post('/ParsedText')
-def scrape(analyze_request: AnalyzeRequest) -> str:
-    logger.info(f"Analyzing {analyze_request.uri}")
+@app.post('/analyze')
+async def analyze(analyze_request: AnalyzeRequest, request: Request) -> AnalyzeResponse:
+    return await _analyze_uri(analyze_request.uri, analyze_request.strategy, _client_key(request))
+
+def _batch_error(error: Optional[Exception], default: str) -> Optional[str]:
+    if error is None:
+        return None
+    if isinstance(error, HTTPException):
+        return error.detail
+    return _model_error(error, default).detail
+
+async def _batch_uri_items(uris: list[str], strategy: Optional[FetchStrategy], client: str) -> AsyncIterator[BatchAnalyzeItem]:
+    # URIs that canonicalize the same are fetched and analyzed once, and charged once, on a cache miss
+    items = map_unique(lambda uri: _analyze_uri(uri, strategy, client), uris, canonicalize_uri, settings.batch_concurrency)
+    async for index, response, error in items:
+        yield BatchAnalyzeItem(
+            index=index,
+            uri=uris[index],
+            result=response.result if response else None,
+            error=_batch_error(error, 'Could not analyze page')
+        )
+
+async def _batch_text_items(texts: list[str]) -> AsyncIterator[BatchAnalyzeItem]:
+    async for index, result, error in model_router.analyze_batch(texts, settings.batch_concurrency):
+        if error is not None:
+            logger.error("Failed to analyze batch text %d: %s", index, error)
+        yield BatchAnalyzeItem(index=index, result=result, error=_batch_error(error, 'Could not analyze text'))
+
+@app.post('/analyze/batch')
+async def analyze_batch(batch_request: BatchAnalyzeRequest, request: Request) -> StreamingResponse:
+    count = len(batch_request.uris) + len(batch_request.texts)
+    if count > settings.batch_max_items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {settings.batch_max_items} items per batch'
+        )
+    # the bucket never holds more than the daily limit, so more texts could never be admitted
+    if 0 < client_limiter.limit < len(batch_request.texts):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f'At most {client_limiter.limit} texts per batch, the daily request limit'
+        )
+    # each text counts as one request up front; a URI only when its result is not cached, an over-limit one fails alone
+    client = _client_key(request)
+    if batch_request.texts:
+        await client_limiter.aincrement(client, len(batch_request.texts))
+
+    logger.info('Analyzing batch of %d uris and %d texts', len(batch_request.uris), len(batch_request.texts))
+
+    async def lines() -> AsyncIterator[str]:
+        # one JSON object per line, written as soon as each item completes
+        items = merge(
+            _batch_uri_items(batch_request.uris, batch_request.strategy, client),
+            _batch_text_items(batch_request.texts)
+        )
+        async for item in items:
+            yield item.model_dump_json() + '\n'
+
+    return StreamingResponse(lines(), media_type='application/x-ndjson')
 
-    # If user wants to use selenium, override the flag
-    web_parser.use_selenium = analyze_request.use_selenium
+@app.post('/ParsedText')
+async def scrape(analyze_request: AnalyzeRequest) -> str:
+    logger.info('Analyzing %s', analyze_request.uri)
 
-    # Call the updated parse() method
-    text = web_parser.parse(analyze_request.uri)
+    # the fetch strategy is chosen per request; use_selenium forces the browser
+    text = await web_parser.parse(analyze_request.uri, analyze_request.strategy, model_router.text_token_budget)
 
     if not text:
-        logger.warning(f"Failed to extract text from {analyze_request.uri}")
+        logger.warning('Failed to extract text from %s', analyze_request.uri)
         return "No text could be extracted from the given URL."
 
     return text
 
-@app.post('/EnhancedText')
-def enhance(analyze_response: AnalyzeResponse) -> str:
+async def _enhance_uri(analyze_response: AnalyzeResponse, client: Optional[str] = None) -> str:
      # try to use cached result
-    enhanced_cached_result = enhanced_result_cache.get(analyze_response.uri)
+    cache_key = canonicalize_uri(analyze_response.uri)
+    enhanced_cached_result = await enhanced_result_cache.aget(cache_key)
 
     if enhanced_cached_result:
         logger.info('Returning enhanced_cached result for %s', analyze_response.uri)
         return enhanced_cached_result
 
+    await _charge(client)
 
     logger.info('Enhancing %s', analyze_response.uri)
-    text = web_parser.parse(analyze_response.uri)
+    text = await web_parser.parse(analyze_response.uri, max_text_tokens=bias_analyzer2.text_token_budget)
 
     if not text:
         raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Could not parse page')
@@ -155,13 +405,67 @@ def enhance(analyze_response: AnalyzeResponse) -> str:
     try:
         # logger.info(text)
         # logger.info(analyze_response.result)
-        result = bias_analyzer2.enhance(text,analyze_response.result)
-        enhanced_result_cache[analyze_response.uri] = result
+        result = await bias_analyzer2.enhance(text,analyze_response.result)
+        await enhanced_result_cache.store(cache_key, result)
         return result
     
     except Exception as e:
         logger.exception("Failed to analyze %s: %s", analyze_response.uri, str(e))
-        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='Could not analyze page')
+        raise _model_error(e, 'Could not analyze page')
+
+@app.post('/EnhancedText')
+async def enhance(analyze_response: AnalyzeResponse, request: Request) -> str:
+    return await _enhance_uri(analyze_response, _client_key(request))
+
+def _sse(event: str, data: Any) -> str:
+    # one server-sent event; data is JSON so chunks with newlines survive the framing
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+# time from receiving /EnhancedText/stream to sending the first chunk, parsing included
+enhance_stream_ttfb = LatencyStats()
+
+@app.post('/EnhancedText/stream')
+async def enhance_stream(analyze_response: AnalyzeResponse, request: Request) -> StreamingResponse:
+    start = time.perf_counter()
+    cache_key = canonicalize_uri(analyze_response.uri)
+    enhanced_cached_result = await enhanced_result_cache.aget(cache_key)
+
+    text = None
+    if not enhanced_cached_result:
+        await _charge(_client_key(request))
+        logger.info('Streaming enhancement of %s', analyze_response.uri)
+        text = await web_parser.parse(analyze_response.uri, max_text_tokens=bias_analyzer2.text_token_budget)
+        if not text:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail='Could not parse page')
+
+    async def events() -> AsyncIterator[str]:
+        # `chunk` events with pieces of the text, then `done`, or `error` if the model call fails
+        if enhanced_cached_result:
+            logger.info('Returning enhanced_cached result for %s', analyze_response.uri)
+            enhance_stream_ttfb.record(time.perf_counter() - start)
+            yield _sse('chunk', enhanced_cached_result)
+            yield _sse('done', None)
+            return
+
+        chunks = []
+        try:
+            async for chunk in bias_analyzer2.enhance_stream(text, analyze_response.result):
+                if not chunks:
+                    enhance_stream_ttfb.record(time.perf_counter() - start)
+                chunks.append(chunk)
+                yield _sse('chunk', chunk)
+        except Exception as e:
+            logger.exception("Failed to analyze %s: %s", analyze_response.uri, str(e))
+            if not chunks:
+                enhance_stream_ttfb.record(time.perf_counter() - start, error=True)
+            yield _sse('error', _model_error(e, 'Could not analyze page').detail)
+            return
+
+        # only a complete rewrite is cached; a client that disconnects early closes this generator first
+        await enhanced_result_cache.store(cache_key, ''.join(chunks))
+        yield _sse('done', None)
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
 
 # @app.post('/analyzeEnhancedUsingModel2')
 # def analyze(text: str) -> AnalyzeResult:
@@ -210,8 +514,24 @@ def enhance(analyze_response: AnalyzeResponse) -> str:
 #         logger.exception("Failed to analyze.... %s", str(e))
 #         raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail='Could not analyze text')
 
+async def _analyze_enhanced_text(text: str, client: Optional[str] = None) -> AnalyzeResult:
+    cached_result = await pro_version_analysis.aget(text)
+    if cached_result:
+        logger.info('Returning cached result for the enhanced text')
+        return cached_result
+
+    await _charge(client)
+
+    try:
+        result = await bias_analyzer.analyze(text)
+        await pro_version_analysis.store(text, result)
+        return result
+    except Exception as e:
+        logger.exception("Failed to analyze enhanced text: %s", str(e))
+        raise _model_error(e, "Could not analyze enhanced text")
+
 @app.post("/analyzeEnhancedUsingModel2")
-def analyze_enhanced_using_model2(payload: dict = Body(...)):
+async def analyze_enhanced_using_model2(request: Request, payload: dict = Body(...)):
     """
     Expects JSON like:
     {
@@ -223,12 +543,102 @@ def analyze_enhanced_using_model2(payload: dict = Body(...)):
     if not text:
         raise HTTPException(status_code=400, detail="JSON body must include 'text' field")
 
-    try:
-        result = bias_analyzer.analyze(text)
-        pro_version_analysis[text] = result
-        return result
-    except Exception as e:
-        logger.exception("Failed to analyze enhanced text: %s", str(e))
-        raise HTTPException(status_code=500, detail="Could not analyze enhanced text")
-
+    return await _analyze_enhanced_text(text, _client_key(request))
+
+
+# ------------------------------------------------------------
+# BACKGROUND JOBS: the endpoints above, run by a worker pool
+# ------------------------------------------------------------
+# the body each job kind takes, same as its endpoint
+JOB_PAYLOADS: dict[JobKind, type[BaseModel]] = {
+    JobKind.ANALYZE: AnalyzeRequest,
+    JobKind.ENHANCE: AnalyzeResponse,
+    JobKind.ANALYZE_ENHANCED: EnhancedTextRequest,
+}
+
+def _job_handler(kind: JobKind, fn) -> JobHandler:
+    async def handle(payload: dict):
+        try:
+            return await fn(JOB_PAYLOADS[kind].model_validate(payload))
+        except ValidationError:
+            raise JobError('Invalid job payload')
+        except HTTPException as e:
+            raise JobError(e.detail)
+    return handle
+
+job_queue: JobQueue = JobQueue(
+    settings.jobs_path,
+    {
+        JobKind.ANALYZE: _job_handler(JobKind.ANALYZE, lambda request: _analyze_uri(request.uri, request.strategy)),
+        JobKind.ENHANCE: _job_handler(JobKind.ENHANCE, _enhance_uri),
+        JobKind.ANALYZE_ENHANCED: _job_handler(JobKind.ANALYZE_ENHANCED, lambda request: _analyze_enhanced_text(request.text)),
+    },
+    workers=settings.jobs_workers,
+    job_timeout=settings.jobs_timeout,
+    max_attempts=settings.jobs_max_attempts,
+    retention=settings.jobs_retention
+)
 
+# charged when submitted, whether or not the result turns out to be cached
+@app.post('/jobs', status_code=status.HTTP_202_ACCEPTED, dependencies=[Depends(rate_limit)])
+def submit_job(job_request: JobRequest) -> JobResponse:
+    try:
+        JOB_PAYLOADS[job_request.kind].model_validate(job_request.payload)
+    except ValidationError as e:
+        raise HTTPException(status_code=status.HTTP_422_UNPROCESSABLE_ENTITY, detail=e.errors(include_url=False))
+
+    job = job_queue.submit(job_request.kind, job_request.payload, job_request.priority)
+    logger.info('Queued %s job %s', job.kind.value, job.id)
+    return job
+
+def _get_job(job_id: str) -> JobResponse:
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail='Job not found')
+    return job
+
+@app.get('/jobs/{job_id}')
+def get_job(job_id: str) -> JobResponse:
+    return _get_job(job_id)
+
+@app.get('/jobs/{job_id}/events')
+async def job_events(job_id: str) -> StreamingResponse:
+    await asyncio.to_thread(_get_job, job_id)
+
+    async def events() -> AsyncIterator[str]:
+        # server-sent events: one `status` event per change, the last one carries the result
+        async for job in job_queue.watch(job_id):
+            yield _sse('status', job.model_dump(mode='json'))
+
+    return StreamingResponse(events(), media_type='text/event-stream', headers={'Cache-Control': 'no-cache'})
+
+
+@app.get('/limit')
+def limit(request: Request) -> LimitResponse:
+    return client_limiter.status(_client_key(request))
+
+
+@app.get('/metrics')
+def metrics() -> PlainTextResponse:
+    # Prometheus scrape target; each worker process reports its own series
+    return PlainTextResponse(REGISTRY.expose(), media_type=REGISTRY.CONTENT_TYPE)
+
+
+@app.get('/stats')
+def stats() -> dict:
+    return {
+        'web_parser': web_parser.stats,
+        'bias_analyzer': bias_analyzer.stats,
+        'bias_analyzer2': bias_analyzer2.stats,
+        'model_router': model_router.stats,
+        'jobs': job_queue.stats,
+        'enhance_stream_ttfb': enhance_stream_ttfb.stats,
+        'caches': {
+            cache.name: cache.stats
+            for cache in (result_cache, enhanced_result_cache, pro_version_analysis, analysis_cache)
+        },
+        'models': {
+            gemini_client.model_name: gemini_client.stats,
+            gemini_client2.model_name: gemini_client2.stats,
+        },
+    }
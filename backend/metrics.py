@@ -0,0 +1,218 @@
+import bisect
+import threading
+import time
+from abc import ABC, abstractmethod
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Iterator, Optional
+
+# seconds, from a cache lookup to a slow Pro call
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+
+def _escape(value: str) -> str:
+    return value.replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labelnames: tuple[str, ...], values: tuple[str, ...], extra: Optional[tuple[str, str]] = None) -> str:
+    pairs = list(zip(labelnames, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ''
+    return '{' + ','.join(f'{name}="{_escape(value)}"' for name, value in pairs) + '}'
+
+
+def _format_value(value: float) -> str:
+    return repr(float(value)) if value != int(value) else str(int(value))
+
+
+class _Metric(ABC):
+    type = ''
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._lock = threading.Lock()
+
+    def _label_values(self, labels: dict) -> tuple[str, ...]:
+        if set(labels) != set(self.labelnames):
+            raise ValueError(f'{self.name} takes labels {self.labelnames}, got {tuple(labels)}')
+        return tuple(str(labels[name]) for name in self.labelnames)
+
+    @abstractmethod
+    def samples(self) -> Iterator[str]:
+        """ The metric's lines in the text exposition format, without HELP and TYPE. """
+
+    def expose(self) -> str:
+        lines = [f'# HELP {self.name} {self.documentation}', f'# TYPE {self.name} {self.type}']
+        lines.extend(self.samples())
+        return '\n'.join(lines)
+
+
+class Counter(_Metric):
+    type = 'counter'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()):
+        super().__init__(name, documentation, labelnames)
+        self._values: dict[tuple[str, ...], float] = {}
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def value(self, **labels) -> float:
+        return self._values.get(self._label_values(labels), 0)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}'
+
+
+class Histogram(_Metric):
+    type = 'histogram'
+
+    def __init__(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # per label set: counts per bucket (not cumulative, the last one is +Inf), sum
+        self._values: dict[tuple[str, ...], tuple[list[int], float]] = {}
+
+    def observe(self, value: float, **labels):
+        key = self._label_values(labels)
+        with self._lock:
+            counts, total = self._values.get(key) or ([0] * (len(self.buckets) + 1), 0.0)
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self) -> Iterator[str]:
+        with self._lock:
+            values = {key: (list(counts), total) for key, (counts, total) in self._values.items()}
+        for key, (counts, total) in sorted(values.items()):
+            cumulative = 0
+            for bound, count in zip((*self.buckets, float('inf')), counts):
+                cumulative += count
+                le = '+Inf' if bound == float('inf') else _format_value(bound)
+                yield f'{self.name}_bucket{_format_labels(self.labelnames, key, ("le", le))} {cumulative}'
+            yield f'{self.name}_sum{_format_labels(self.labelnames, key)} {_format_value(total)}'
+            yield f'{self.name}_count{_format_labels(self.labelnames, key)} {cumulative}'
+
+
+class Registry:
+    """ The process's metrics, rendered in the Prometheus text exposition format. """
+
+    CONTENT_TYPE = 'text/plain; version=0.0.4; charset=utf-8'
+
+    def __init__(self):
+        self._metrics: dict[str, _Metric] = {}
+
+    def register(self, metric: _Metric) -> _Metric:
+        if metric.name in self._metrics:
+            raise ValueError(f'Metric {metric.name} is already registered')
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: tuple[str, ...] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: tuple[str, ...] = (), buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def expose(self) -> str:
+        return '\n'.join(metric.expose() for metric in self._metrics.values()) + '\n'
+
+
+REGISTRY = Registry()
+
+STAGE_SECONDS = REGISTRY.histogram(
+    'aibias_stage_duration_seconds',
+    'Time spent in each stage of the request pipeline',
+    ('stage',)
+)
+MODEL_FIRST_CHUNK_SECONDS = REGISTRY.histogram(
+    'aibias_model_first_chunk_seconds',
+    'Time from sending a prompt to the first streamed chunk of the response',
+    ('model',)
+)
+MODEL_CALL_SECONDS = REGISTRY.histogram(
+    'aibias_model_call_seconds',
+    'Time from sending a prompt to the end of the streamed response',
+    ('model', 'outcome')
+)
+CACHE_LOOKUPS = REGISTRY.counter(
+    'aibias_cache_lookups_total',
+    'Cache lookups by cache and result (hit or miss)',
+    ('cache', 'result')
+)
+
+
+# ------------------------------------------------------------
+# PER-REQUEST TIMINGS: the Server-Timing response header
+# ------------------------------------------------------------
+# stage -> (total seconds, count) for the request being handled, when the header is enabled
+_request_timings: ContextVar[Optional[dict[str, list[float]]]] = ContextVar('request_timings', default=None)
+
+
+def record_stage(stage: str, seconds: float):
+    """ Records a stage duration in the histogram and, if enabled, the current request's timings. """
+    STAGE_SECONDS.observe(seconds, stage=stage)
+    timings = _request_timings.get()
+    if timings is not None:
+        # stages that run more than once (chunks, retries) add up
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_stage(stage, time.perf_counter() - start)
+
+
+def server_timing(timings: dict[str, list[float]], total: float) -> str:
+    entries = [
+        f'{stage};dur={seconds * 1000:.1f}' + (f';desc="x{int(count)}"' if count > 1 else '')
+        for stage, (seconds, count) in timings.items()
+    ]
+    entries.append(f'total;dur={total * 1000:.1f}')
+    return ', '.join(entries)
+
+
+class ServerTimingMiddleware:
+    """
+    Adds a Server-Timing header with the time each pipeline stage took for
+    the request (shown by the browser's devtools). Streaming responses send
+    their headers before the body, so they only report the stages that ran
+    before the first byte.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope['type'] != 'http':
+            await self.app(scope, receive, send)
+            return
+
+        start = time.perf_counter()
+        timings: dict[str, list[float]] = {}
+        token = _request_timings.set(timings)
+
+        async def send_with_timing(message):
+            if message['type'] == 'http.response.start':
+                header = server_timing(timings, time.perf_counter() - start)
+                message = {**message, 'headers': [*message.get('headers', []), (b'server-timing', header.encode('latin-1'))]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
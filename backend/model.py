@@ -1,12 +1,35 @@
 from datetime import datetime
-from typing import Optional
+from enum import Enum
+from typing import Any, Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 
 
-class AnalyzeRequest(BaseModel):
-    uri: str
+class FetchStrategy(str, Enum):
+    STATIC = 'static'      # plain HTTP fetch
+    BROWSER = 'browser'    # render with a headless browser
+    AUTO = 'auto'          # static first, browser only when too little text was extracted
+
+
+class FetchOptions(BaseModel):
     use_selenium: bool = False
+    fetch_strategy: Optional[FetchStrategy] = None
+
+    @property
+    def strategy(self) -> Optional[FetchStrategy]:
+        # use_selenium is kept for older clients; None means the server default
+        if self.use_selenium:
+            return FetchStrategy.BROWSER
+        return self.fetch_strategy
+
+
+class AnalyzeRequest(FetchOptions):
+    uri: str
+
+
+class BatchAnalyzeRequest(FetchOptions):
+    uris: list[str] = []
+    texts: list[str] = []
 
 class AnalyzeResult(BaseModel):
     summary: str
@@ -27,11 +50,19 @@ class AnalyzeResult(BaseModel):
     improvement_suggestions: str
     male_to_female_mention_ratio: float
     gender_neutral_language_percentage: float
+    # raw counts behind the ratio, used to merge analyses of long texts analyzed in chunks
+    male_mention_count: Optional[int] = None
+    female_mention_count: Optional[int] = None
 
     # --- NEW FIELDS ---
     # Sentiment analysis (0-100) and label
     sentiment_score: Optional[float] = None                 # 0..100
     sentiment_label: Optional[str] = None                 # "Positive" / "Neutral" / "Negative"
+    sentiment_compound: Optional[float] = None            # length-weighted mean of sentence compounds, -1..1
+    sentiment_mean: Optional[float] = None                # unweighted mean of sentence compounds
+    sentiment_variance: Optional[float] = None            # high when the text mixes positive and negative passages
+    sentiment_sections: Optional[list[float]] = None      # compound per tenth of the text, in reading order
+    sentiment_sentence_count: Optional[int] = None
 
     # Readability metrics
     readability_score: Optional[float] = None             # Flesch Reading Ease (0..100 approx)
@@ -42,9 +73,58 @@ class AnalyzeResult(BaseModel):
 class AnalyzeResponse(BaseModel):
     uri: str
     result: AnalyzeResult
-    created_at: datetime = datetime.now()
+    created_at: datetime = Field(default_factory=datetime.now)
+
+class BatchAnalyzeItem(BaseModel):
+    # position in the request's `uris` (when uri is set) or `texts` list
+    index: int
+    uri: Optional[str] = None
+    result: Optional[AnalyzeResult] = None
+    error: Optional[str] = None
 
 class LimitResponse(BaseModel):
     limit: int
     usage: int
     last_reset: str
+
+
+class EnhancedTextRequest(BaseModel):
+    text: str
+
+
+class JobKind(str, Enum):
+    ANALYZE = 'analyze'                                  # body of /analyze
+    ENHANCE = 'enhance'                                  # body of /EnhancedText
+    ANALYZE_ENHANCED = 'analyzeEnhancedUsingModel2'      # body of /analyzeEnhancedUsingModel2
+
+
+class JobPriority(str, Enum):
+    HIGH = 'high'
+    NORMAL = 'normal'
+    LOW = 'low'
+
+
+class JobStatus(str, Enum):
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+
+
+class JobRequest(BaseModel):
+    kind: JobKind
+    priority: JobPriority = JobPriority.NORMAL
+    # the request body the matching endpoint would take
+    payload: dict[str, Any]
+
+
+class JobResponse(BaseModel):
+    id: str
+    kind: JobKind
+    priority: JobPriority
+    status: JobStatus
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[Any] = None
+    error: Optional[str] = None
@@ -0,0 +1,94 @@
+import hashlib
+import time
+from dataclasses import dataclass
+from typing import Hashable, Optional
+
+from cachetools import LRUCache
+
+
+@dataclass
+class CachedPage:
+    content_hash: str
+    etag: Optional[str]
+    last_modified: Optional[str]
+    fetched_at: float
+
+
+class PageCache:
+    """
+    Parsed-text cache shared by every endpoint that goes through WebParser.
+
+    Pages are keyed by normalized URI and point at their extracted text by the
+    hash of the downloaded markup, so pages with identical markup share one
+    stored text.
+    Entries younger than fresh_ttl are served without touching the network;
+    older ones are revalidated with a conditional GET using the stored
+    ETag / Last-Modified validators.
+    """
+
+    def __init__(self, maxsize: int, fresh_ttl: float):
+        self.fresh_ttl = fresh_ttl
+        self._pages: LRUCache = LRUCache(maxsize=maxsize)
+        self._texts: LRUCache = LRUCache(maxsize=maxsize)
+
+        self.hits = 0
+        self.misses = 0
+        self.revalidated = 0
+        self.content_hits = 0
+
+    @staticmethod
+    def content_hash(html_content: str) -> str:
+        return hashlib.sha256(html_content.encode('utf-8', errors='surrogatepass')).hexdigest()
+
+    def lookup(self, key: Hashable) -> tuple[Optional[CachedPage], Optional[str]]:
+        """ Returns the cached page and its text, or (None, None) if either has been evicted. """
+        page = self._pages.get(key)
+        if page is None:
+            return None, None
+
+        text = self._texts.get(page.content_hash)
+        if text is None:
+            del self._pages[key]
+            return None, None
+
+        return page, text
+
+    def is_fresh(self, page: CachedPage) -> bool:
+        return time.monotonic() - page.fetched_at < self.fresh_ttl
+
+    @staticmethod
+    def conditional_headers(page: Optional[CachedPage]) -> dict:
+        headers = {}
+        if page is not None:
+            if page.etag:
+                headers['If-None-Match'] = page.etag
+            if page.last_modified:
+                headers['If-Modified-Since'] = page.last_modified
+        return headers
+
+    def text_for_content(self, content_hash: str) -> Optional[str]:
+        text = self._texts.get(content_hash)
+        if text is not None:
+            self.content_hits += 1
+        return text
+
+    def store(self, key: Hashable, content_hash: str, text: str, etag: Optional[str] = None, last_modified: Optional[str] = None):
+        self._texts[content_hash] = text
+        self._pages[key] = CachedPage(content_hash, etag, last_modified, time.monotonic())
+
+    def touch(self, key: Hashable, page: CachedPage):
+        """ Marks a page as fresh again after a 304 Not Modified. """
+        page.fetched_at = time.monotonic()
+        self._pages[key] = page
+
+    @property
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses + self.revalidated
+        return {
+            'size': len(self._pages),
+            'hits': self.hits,
+            'misses': self.misses,
+            'revalidated': self.revalidated,
+            'content_hits': self.content_hits,
+            'hit_ratio': (self.hits + self.revalidated) / lookups if lookups else 0.0,
+        }
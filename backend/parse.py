@@ -1,107 +1,212 @@
-import requests
-from bs4 import BeautifulSoup, Comment
-from typing import Optional
-import logging
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from webdriver_manager.chrome import ChromeDriverManager
+import asyncio
+import hashlib
 import time
 
-# Setting up logging
-logger = logging.getLogger(__name__)
-logger.setLevel(logging.DEBUG)
-
-formatter = logging.Formatter('%(asctime)s:%(name)s:%(message)s')
+import httpx
+from typing import Optional
+import logging
 
-file_handler = logging.FileHandler('parse.log')
-file_handler.setFormatter(formatter)
+from .browser import BrowserPool
+from .extract import TextExtractor, extractor_class
+from .encoding import StreamDecoder
+from .fetch import Fetcher
+from .metrics import CACHE_LOOKUPS, record_stage, stage_timer
+from .model import FetchStrategy
+from .pagecache import PageCache
+from .singleflight import SingleFlight
+from .tokens import CHARS_PER_TOKEN, truncate_to_tokens
+from .uri import canonicalize_uri
 
-logger.addHandler(file_handler)
+logger = logging.getLogger(__name__)
 
 
 class WebParser:
 
-    def __init__(self, max_content_length: int, chunk_size: int, use_selenium: bool = False):
+    def __init__(
+        self,
+        max_content_length: int,
+        chunk_size: int,
+        default_strategy: FetchStrategy = FetchStrategy.STATIC,
+        min_text_length: int = 500,
+        max_concurrency: int = 32,
+        cache_size: int = 256,
+        cache_ttl: float = 300,
+        fetcher: Optional[Fetcher] = None,
+        browser_pool: Optional[BrowserPool] = None,
+        extractor: str = 'lxml',
+    ):
         self.max_content_length = max_content_length
         self.chunk_size = chunk_size
-        self.use_selenium = use_selenium
-
-    @staticmethod
-    def _tag_visible(element):
-        if element.strip() == '':
-            return False
-        if element.parent.name in ['style', 'script', 'head', 'title', 'meta', 'svg', 'path', 'noscript', 'header', 'footer', 'nav', '[document]']:
-            return False
-        if isinstance(element, Comment):
-            return False
-        if element.parent.get('hidden'):
-            return False
-        if element.parent.get('aria-hidden') == 'true':
-            return False
-
-        return True
-
-    @staticmethod
-    def _text_from_html(html_content):
-        soup = BeautifulSoup(html_content, 'html.parser')
-        texts = soup.find_all(text=True)
-        visible_texts = filter(WebParser._tag_visible, texts)
-
-        return ' '.join(t.strip() for t in visible_texts)
-
-    def _get_html_using_selenium(self, uri: str) -> str:
-        """ Use Selenium to get the full page source (JS rendered content). """
-        options = Options()
-        options.headless = True  # Run the browser in headless mode (without opening a window)
-
-        # Initialize the WebDriver (Chrome)
-        driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+        self.default_strategy = default_strategy
+        # AUTO escalates to the browser when static extraction yields less text than this
+        self.min_text_length = min_text_length
+        self.escalations = 0
+
+        self.bytes_read = 0
+        self.budget_cutoffs = 0
+
+        # bounds the number of pages fetched at the same time
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.fetcher = fetcher or Fetcher()
+        self.browser_pool = browser_pool or BrowserPool()
+        self.extractor: type[TextExtractor] = extractor_class(extractor)
+
+        # concurrent parses of the same page share one download
+        self._flight = SingleFlight()
+
+        # parsed text shared by every endpoint, revalidated with conditional GETs
+        self._cache = PageCache(cache_size, cache_ttl)
+
+    async def _get_text_using_httpx(
+        self, uri: str, headers: dict, max_text_tokens: Optional[int]
+    ) -> tuple[Optional[TextExtractor], str, httpx.Headers, float]:
+        """
+        Stream the page over HTTP into a text extractor as chunks arrive.
+        Reading stops at max_content_length bytes (counted before charset decoding)
+        or once the extracted text fills max_text_tokens.
+        Returns the extractor, the hash of the markup and the seconds spent feeding the extractor,
+        or no extractor when the server answers 304 Not Modified.
+        """
+        async with self.fetcher.stream(uri, headers=headers) as response:
+            if response.status_code == httpx.codes.NOT_MODIFIED:
+                return None, '', response.headers, 0.0
+
+            response.raise_for_status()
+
+            extractor = self.extractor()
+            decoder = StreamDecoder(response.charset_encoding)
+            content_hash = hashlib.sha256()
+            content_length = 0
+            max_text_length = max_text_tokens * CHARS_PER_TOKEN if max_text_tokens else None
+            # most of the extraction happens here, chunk by chunk, between network reads
+            extract_seconds = 0.0
+
+            async for chunk in response.aiter_bytes(chunk_size=self.chunk_size):
+                remaining = self.max_content_length - content_length
+                if len(chunk) > remaining:
+                    chunk = chunk[:remaining]
+
+                content_hash.update(chunk)
+                content_length += len(chunk)
+                start = time.perf_counter()
+                extractor.feed(decoder.decode(chunk))
+                extract_seconds += time.perf_counter() - start
+
+                if content_length >= self.max_content_length:
+                    logger.warning('Max content length %d exceeded for URI %s, truncating', self.max_content_length, uri)
+                    break
+
+                if max_text_length and extractor.text_length >= max_text_length:
+                    logger.info('Text budget of %d tokens reached for URI %s after %d bytes', max_text_tokens, uri, content_length)
+                    self.budget_cutoffs += 1
+                    break
+
+            start = time.perf_counter()
+            extractor.feed(decoder.flush())
+            extract_seconds += time.perf_counter() - start
+            self.bytes_read += content_length
+
+            return extractor, f'{content_hash.hexdigest()}:{max_text_tokens}', response.headers, extract_seconds
+
+    async def parse(self, uri: str, strategy: Optional[FetchStrategy] = None, max_text_tokens: Optional[int] = None) -> Optional[str]:
+        """
+        Returns the visible text of a page. With max_text_tokens set, the text is cut
+        to that budget and the download stops as soon as the budget is filled.
+        """
+        strategy = strategy or self.default_strategy
+
+        if strategy == FetchStrategy.AUTO:
+            return await self._parse_auto(uri, max_text_tokens)
+
+        key = (canonicalize_uri(uri), strategy, max_text_tokens)
+        with stage_timer('parse'):
+            return await self._flight.do(key, lambda: self._parse(uri, key))
+
+    async def _parse_auto(self, uri: str, max_text_tokens: Optional[int]) -> Optional[str]:
+        text = await self.parse(uri, FetchStrategy.STATIC, max_text_tokens)
+        # None means the fetch itself failed (HTTP or network error): a browser would not do better
+        if text is None or len(text) >= self.min_text_length:
+            return text
+
+        # too little text, probably rendered client-side
+        logger.info('Escalating %s to the browser, static fetch gave %d characters', uri, len(text))
+        self.escalations += 1
+        rendered = await self.parse(uri, FetchStrategy.BROWSER, max_text_tokens)
+
+        if rendered and len(rendered) > len(text):
+            return rendered
+        return text
+
+    async def _parse(self, uri: str, key: tuple[str, FetchStrategy, Optional[int]]) -> Optional[str]:
+        _, strategy, max_text_tokens = key
+
+        page, cached_text = self._cache.lookup(key)
+        if page is not None and self._cache.is_fresh(page):
+            self._cache.hits += 1
+            CACHE_LOOKUPS.inc(cache='page', result='hit')
+            logger.info('Returning cached text for %s', uri)
+            return cached_text
 
         try:
-            driver.get(uri)
-            time.sleep(3)  # Allow time for JavaScript to load the page content
-            html_content = driver.page_source  # Get the page source after JS renders it
-        except Exception as e:
-            logger.error(f"Error with Selenium: {e}")
-            html_content = ""
-        finally:
-            driver.quit()
-
-        return html_content
-
-    def parse(self, uri: str) -> Optional[str]:
-        try:
-            if self.use_selenium:
-                # Try using Selenium to get the content (for dynamically loaded content)
-                logger.info(f"Using Selenium to scrape {uri}")
-                html_content = self._get_html_using_selenium(uri)
-
-                if not html_content:
-                    logger.warning(f"Failed to fetch content using Selenium for {uri}")
-                    return None
-            else:
-                # Fall back to requests for static content
-                logger.info(f"Using requests to scrape {uri}")
-                with requests.get(uri, stream=True) as response:
-                    response.raise_for_status()
-
-                    content = []
-                    content_length = 0
-
-                    for chunk in response.iter_content(chunk_size=self.chunk_size, decode_unicode=True):
-                        content.append(chunk)
-                        content_length += len(chunk)
-
-                        if content_length > self.max_content_length:
-                            logger.warning('Max content length %d exceeded for URI %s, truncating', self.max_content_length, uri)
-                            break
-
-                    html_content = ''.join(content)
-
-            # Return the visible text from the fetched HTML content
-            return self._text_from_html(html_content)
-
-        except requests.RequestException as e:
-            logger.error(f"Error parsing URI {uri}: {e}")
+            async with self._semaphore:
+                if strategy == FetchStrategy.BROWSER:
+                    # Try using Selenium to get the content (for dynamically loaded content)
+                    logger.info('Using Selenium to scrape %s', uri)
+                    html_content = await self.browser_pool.render(uri)
+                    headers = httpx.Headers()
+
+                    if not html_content:
+                        logger.warning('Failed to fetch content using Selenium for %s', uri)
+                        return None
+
+                    extractor = self.extractor()
+                    start = time.perf_counter()
+                    extractor.feed(html_content)
+                    extract_seconds = time.perf_counter() - start
+                    content_hash = f'{self._cache.content_hash(html_content)}:{max_text_tokens}'
+                else:
+                    # Fall back to plain HTTP for static content
+                    logger.info('Using httpx to scrape %s', uri)
+                    extractor, content_hash, headers, extract_seconds = await self._get_text_using_httpx(
+                        uri, self._cache.conditional_headers(page), max_text_tokens
+                    )
+
+            if extractor is None:
+                self._cache.revalidated += 1
+                CACHE_LOOKUPS.inc(cache='page', result='revalidated')
+                self._cache.touch(key, page)
+                logger.info('Cached text for %s is still valid', uri)
+                return cached_text
+
+            self._cache.misses += 1
+            CACHE_LOOKUPS.inc(cache='page', result='miss')
+            text = self._cache.text_for_content(content_hash)
+
+            if text is None:
+                # Finish extracting the visible text off the event loop
+                start = time.perf_counter()
+                text = await asyncio.to_thread(extractor.close)
+                extract_seconds += time.perf_counter() - start
+                if max_text_tokens:
+                    text = truncate_to_tokens(text, max_text_tokens)
+            # feeding and closing the extractor, one observation per page
+            record_stage('extract', extract_seconds)
+
+            self._cache.store(key, content_hash, text, headers.get('etag'), headers.get('last-modified'))
+            return text
+
+        except (httpx.HTTPError, httpx.InvalidURL) as e:
+            logger.error('Error parsing URI %s: %s', uri, e)
             return None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'auto_escalations': self.escalations,
+            'bytes_read': self.bytes_read,
+            'budget_cutoffs': self.budget_cutoffs,
+            'single_flight': self._flight.stats,
+            'page_cache': self._cache.stats,
+            'fetch': self.fetcher.stats,
+            'browser_pool': self.browser_pool.stats,
+        }
@@ -0,0 +1,81 @@
+import hashlib
+from typing import Optional
+
+from jinja2 import Environment, Template, UndefinedError
+
+# stands in for the article text while the rest of a prompt is rendered
+TEXT_PLACEHOLDER = '\x00__PROMPT_TEXT__\x00'
+
+
+class PromptTemplate:
+    """
+    A compiled prompt template split around its `text` variable.
+
+    The part of the prompt that does not depend on the request is rendered once
+    and the article text is concatenated in per request, so Jinja never has to
+    walk a large article. Templates that take more variables than `text` are
+    rendered with the placeholder (cheap, the text is the large part) and split
+    the same way.
+
+    With an auto-reloading environment, edits to the template file are picked up
+    and the cached parts rebuilt.
+    """
+
+    def __init__(self, env: Environment, name: str):
+        self.env = env
+        self.name = name
+        self._digest = ''
+        self._template: Optional[Template] = None
+        self._static_parts: Optional[tuple[str, str]] = None
+
+    def _load(self) -> Template:
+        # the environment caches compiled templates; with auto_reload it returns a new object after an edit
+        template = self.env.get_template(self.name)
+        if template is not self._template:
+            source, _, _ = self.env.loader.get_source(self.env, self.name)
+            self._digest = hashlib.sha256(source.encode('utf-8')).hexdigest()[:16]
+            try:
+                self._static_parts = self._split(template.render(text=TEXT_PLACEHOLDER))
+            except UndefinedError:
+                # needs more context than the text, rendered per call instead
+                self._static_parts = None
+            self._template = template
+        return template
+
+    @property
+    def digest(self) -> str:
+        """ Short hash of the template source, changes when the template is edited. """
+        self._load()
+        return self._digest
+
+    @staticmethod
+    def _split(rendered: str) -> Optional[tuple[str, str]]:
+        if rendered.count(TEXT_PLACEHOLDER) != 1:
+            return None
+        prefix, suffix = rendered.split(TEXT_PLACEHOLDER)
+        return prefix, suffix
+
+    def render(self, text: str, **context) -> str:
+        template = self._load()
+
+        parts = self._static_parts if not context else self._split(template.render(text=TEXT_PLACEHOLDER, **context))
+        if parts is None:
+            # text used more than once, or not at all: nothing to precompute
+            return template.render(text=text, **context)
+
+        prefix, suffix = parts
+        return prefix + text + suffix
+
+
+class PromptLibrary:
+    """ PromptTemplates for every template in one environment, created on first use. """
+
+    def __init__(self, env: Environment):
+        self.env = env
+        self._prompts: dict[str, PromptTemplate] = {}
+
+    def __getitem__(self, name: str) -> PromptTemplate:
+        prompt = self._prompts.get(name)
+        if prompt is None:
+            prompt = self._prompts[name] = PromptTemplate(self.env, name)
+        return prompt
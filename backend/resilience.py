@@ -0,0 +1,233 @@
+import asyncio
+import logging
+import random
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional, TypeVar
+
+from google.api_core import exceptions as api_exceptions
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Vertex errors worth another attempt: rate limiting, overload and transient server faults.
+# Client errors (bad request, permission denied, ...) fail the same way every time.
+RETRYABLE_ERRORS = (
+    api_exceptions.TooManyRequests,
+    api_exceptions.ResourceExhausted,
+    api_exceptions.ServiceUnavailable,
+    api_exceptions.InternalServerError,
+    api_exceptions.DeadlineExceeded,
+    api_exceptions.GatewayTimeout,
+    asyncio.TimeoutError,
+)
+
+
+class CircuitOpenError(Exception):
+    """ Raised instead of calling a backend that is known to be down. """
+
+
+class CircuitBreaker:
+    """
+    Fails calls fast while a backend is down.
+
+    After failure_threshold consecutive retryable failures the circuit opens
+    and every call is rejected for reset_timeout seconds. Then a single trial
+    call is let through (half-open): success closes the circuit, failure opens
+    it again.
+    """
+
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0, clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._clock = clock
+
+        self.state = self.CLOSED
+        self._failures = 0
+        self._opened_at = 0.0
+        self._trial_in_flight = False
+        self.rejected = 0
+        self.opened = 0
+
+    def before_call(self):
+        if self.state == self.OPEN and self._clock() - self._opened_at >= self.reset_timeout:
+            self.state = self.HALF_OPEN
+            self._trial_in_flight = False
+
+        if self.state == self.OPEN or (self.state == self.HALF_OPEN and self._trial_in_flight):
+            self.rejected += 1
+            raise CircuitOpenError('Model backend unavailable')
+
+        if self.state == self.HALF_OPEN:
+            self._trial_in_flight = True
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self._failures = 0
+        self._trial_in_flight = False
+
+    def cancel_trial(self):
+        # the trial call was abandoned without an answer either way
+        self._trial_in_flight = False
+
+    def record_failure(self):
+        self._failures += 1
+        if self.state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.opened += 1
+                logger.warning('Circuit opened after %d failures', self._failures)
+            self.state = self.OPEN
+            self._opened_at = self._clock()
+            self._trial_in_flight = False
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'state': self.state,
+            'consecutive_failures': self._failures,
+            'opened': self.opened,
+            'rejected': self.rejected,
+        }
+
+
+class CallPolicy:
+    """
+    Deadline, retry, circuit breaker and hedging around an async call.
+
+    Each attempt gets `timeout` seconds. Retryable failures are retried up to
+    max_retries times with full-jitter exponential backoff, as in Fetcher.
+    With hedge_after > 0, an attempt that has not finished after that many
+    seconds gets a duplicate racing it; the first to succeed wins and the
+    other is cancelled, which trims the latency tail at the cost of some
+    extra calls.
+
+    `fn` is called once per attempt (hedges included), so it must start a
+    fresh call every time.
+    """
+
+    def __init__(
+        self,
+        timeout: float = 60.0,
+        max_retries: int = 2,
+        backoff: float = 1.0,
+        max_backoff: float = 10.0,
+        hedge_after: float = 0.0,
+        breaker: Optional[CircuitBreaker] = None,
+        rng: Optional[random.Random] = None,
+    ):
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.hedge_after = hedge_after
+        self.breaker = breaker or CircuitBreaker()
+        self._rng = rng or random.Random()
+
+        self.calls = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.hedge_wins = 0
+
+    def _retry_delay(self, attempt: int) -> float:
+        return self._rng.uniform(0, min(self.max_backoff, self.backoff * 2 ** attempt))
+
+    async def _attempt(self, fn: Callable[[], Awaitable[T]]) -> T:
+        try:
+            return await asyncio.wait_for(fn(), self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def _hedged(self, fn: Callable[[], Awaitable[T]]) -> T:
+        if self.hedge_after <= 0:
+            return await self._attempt(fn)
+
+        primary = asyncio.ensure_future(self._attempt(fn))
+        pending = {primary}
+        error: Optional[BaseException] = None
+        # the finally also covers the first wait, so a cancelled caller never leaves an attempt running
+        try:
+            done, _ = await asyncio.wait(pending, timeout=self.hedge_after)
+            if done:
+                return primary.result()
+
+            self.hedges += 1
+            hedge = asyncio.ensure_future(self._attempt(fn))
+            pending = {primary, hedge}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is hedge:
+                            self.hedge_wins += 1
+                        return task.result()
+                    error = task.exception()
+            # both failed: surface the last failure
+            raise error
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def call(self, fn: Callable[[], Awaitable[T]]) -> T:
+        self.calls += 1
+        attempt = 0
+        while True:
+            self.breaker.before_call()
+            try:
+                result = await self._hedged(fn)
+            except RETRYABLE_ERRORS as e:
+                self.breaker.record_failure()
+                if attempt >= self.max_retries or self.breaker.state == CircuitBreaker.OPEN:
+                    raise
+                delay = self._retry_delay(attempt)
+                logger.warning('Model call failed (%s), retrying in %.2fs', type(e).__name__, delay)
+                self.retries += 1
+                attempt += 1
+                await asyncio.sleep(delay)
+                continue
+            except asyncio.CancelledError:
+                self.breaker.cancel_trial()
+                raise
+            except Exception:
+                # the backend answered, it just rejected this call (bad request, safety block, ...)
+                self.breaker.record_success()
+                raise
+
+            self.breaker.record_success()
+            return result
+
+    async def stream(self, responses: AsyncIterator[T]) -> AsyncIterator[T]:
+        """
+        Yields from a stream opened through call(), giving each item `timeout`
+        seconds. A stream that stalls raises asyncio.TimeoutError; that and
+        other retryable failures count against the circuit breaker. They are
+        not retried, since the caller may have passed earlier items on.
+        """
+        iterator = responses.__aiter__()
+        while True:
+            try:
+                item = await asyncio.wait_for(iterator.__anext__(), self.timeout)
+            except StopAsyncIteration:
+                return
+            except RETRYABLE_ERRORS as e:
+                if isinstance(e, asyncio.TimeoutError):
+                    self.timeouts += 1
+                self.breaker.record_failure()
+                raise
+            yield item
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'calls': self.calls,
+            'retries': self.retries,
+            'timeouts': self.timeouts,
+            'hedges': self.hedges,
+            'hedge_wins': self.hedge_wins,
+            'circuit': self.breaker.stats,
+        }
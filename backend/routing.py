@@ -0,0 +1,122 @@
+import logging
+import time
+from collections import Counter
+from dataclasses import dataclass
+from typing import AsyncIterator, Optional
+
+from pydantic import ValidationError
+
+from .batch import map_unique
+from .bias import BiasAnalyzer
+from .model import AnalyzeResult
+from .resilience import CircuitOpenError
+from .stats import LatencyStats
+from .tokens import estimate_tokens
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class RoutingPolicy:
+    # False sends everything straight to the strong model
+    cascade: bool = True
+    # escalate when the fast model's output is not valid AnalyzeResult JSON
+    escalate_on_invalid: bool = True
+    # escalate when the fast model's overall_score falls in [low, high]
+    borderline_low: int = 40
+    borderline_high: int = 60
+    # texts longer than this skip the fast model (0 = never)
+    long_text_tokens: int = 0
+
+
+class ModelRouter:
+    """
+    Cascade between a fast, cheap analyzer and a slower, stronger one.
+
+    Every text goes to the fast model first and is escalated to the strong
+    model only when the policy says the fast answer is not good enough: its
+    output did not validate, or its score is too close to call. Long texts
+    can be routed to the strong model directly, and texts go there too while
+    the fast model's circuit breaker is open.
+    """
+
+    def __init__(self, fast: BiasAnalyzer, strong: BiasAnalyzer, policy: RoutingPolicy):
+        self.fast = fast
+        self.strong = strong
+        self.policy = policy
+
+        self.requests = 0
+        self.escalations: Counter[str] = Counter()
+        self.latency = {
+            'fast': LatencyStats(),
+            'strong': LatencyStats(),
+        }
+
+    @property
+    def text_token_budget(self) -> int:
+        # the strong model has the last word, so texts are sized for it
+        return self.strong.text_token_budget
+
+    async def _timed(self, route: str, analyzer: BiasAnalyzer, text: str) -> AnalyzeResult:
+        start = time.perf_counter()
+        try:
+            result = await analyzer.analyze(text)
+        except Exception:
+            self.latency[route].record(time.perf_counter() - start, error=True)
+            raise
+        self.latency[route].record(time.perf_counter() - start)
+        return result
+
+    async def _escalate(self, reason: str, text: str) -> AnalyzeResult:
+        self.escalations[reason] += 1
+        return await self._timed('strong', self.strong, text)
+
+    def _is_borderline(self, result: AnalyzeResult) -> bool:
+        return (
+            result.overall_score is not None
+            and self.policy.borderline_low <= result.overall_score <= self.policy.borderline_high
+        )
+
+    async def analyze(self, text: str) -> AnalyzeResult:
+        self.requests += 1
+        policy = self.policy
+
+        if not policy.cascade:
+            return await self._timed('strong', self.strong, text)
+
+        if policy.long_text_tokens and estimate_tokens(text) > policy.long_text_tokens:
+            return await self._escalate('long_text', text)
+
+        try:
+            result = await self._timed('fast', self.fast, text)
+        except (ValidationError, ValueError) as e:
+            # ValueError: the response was not JSON at all
+            if not policy.escalate_on_invalid:
+                raise
+            logger.warning('Fast model output did not validate, escalating: %s', str(e))
+            return await self._escalate('invalid', text)
+        except CircuitOpenError:
+            # the fast model is down; the strong one can still answer
+            return await self._escalate('fast_unavailable', text)
+
+        if self._is_borderline(result):
+            return await self._escalate('borderline', text)
+
+        return result
+
+    async def analyze_batch(
+        self, texts: list[str], concurrency: int = 16
+    ) -> AsyncIterator[tuple[int, Optional[AnalyzeResult], Optional[Exception]]]:
+        """ BiasAnalyzer.analyze_batch through the router. """
+        async for index, result, error in map_unique(self.analyze, texts, lambda text: text, concurrency):
+            yield index, result, error
+
+    @property
+    def stats(self) -> dict:
+        escalated = sum(self.escalations.values())
+        return {
+            'requests': self.requests,
+            'escalations': dict(self.escalations),
+            'escalation_rate': escalated / self.requests if self.requests else 0.0,
+            'latency': {route: latency.stats for route, latency in self.latency.items()},
+        }
@@ -0,0 +1,39 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable, TypeVar
+
+T = TypeVar('T')
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent calls that share a key: the first caller (the leader)
+    runs the work, every caller that arrives while it is in flight awaits the
+    same task and gets the same result or exception.
+    """
+
+    def __init__(self):
+        self._in_flight: dict[Hashable, asyncio.Task] = {}
+        self.leaders = 0
+        self.coalesced = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        task = self._in_flight.get(key)
+
+        if task is None:
+            self.leaders += 1
+            task = asyncio.ensure_future(fn())
+            self._in_flight[key] = task
+            task.add_done_callback(lambda _: self._in_flight.pop(key, None))
+        else:
+            self.coalesced += 1
+
+        # shield so a disconnecting caller does not cancel the work for everyone else
+        return await asyncio.shield(task)
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'leaders': self.leaders,
+            'coalesced': self.coalesced,
+            'in_flight': len(self._in_flight),
+        }
@@ -0,0 +1,40 @@
+import math
+from collections import deque
+
+
+class LatencyStats:
+    """ Running latency summary with percentiles over a window of recent samples. """
+
+    def __init__(self, window: int = 1024):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+        self._recent: deque[float] = deque(maxlen=window)
+
+    def record(self, seconds: float, error: bool = False):
+        self.count += 1
+        self.total += seconds
+        self.max = max(self.max, seconds)
+        self._recent.append(seconds)
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        if not self._recent:
+            return 0.0
+        ordered = sorted(self._recent)
+        index = min(len(ordered) - 1, max(0, math.ceil(q / 100 * len(ordered)) - 1))
+        return ordered[index]
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'count': self.count,
+            'errors': self.errors,
+            'mean': self.total / self.count if self.count else 0.0,
+            'p50': self.percentile(50),
+            'p95': self.percentile(95),
+            'p99': self.percentile(99),
+            'max': self.max,
+        }
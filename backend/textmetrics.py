@@ -0,0 +1,221 @@
+import asyncio
+import hashlib
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass
+from typing import TYPE_CHECKING, Optional
+
+from cachetools import LRUCache
+
+from .chunking import SENTENCE_END
+from .metrics import stage_timer
+from .singleflight import SingleFlight
+
+# numpy, textstat and VADER are imported on first use (or LocalMetrics.warm_up), not with the app
+if TYPE_CHECKING:
+    from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+# the analyzer loads its lexicon on construction, so each process builds it once
+_sentiment_analyzer: Optional['SentimentIntensityAnalyzer'] = None
+
+
+def _get_sentiment_analyzer() -> 'SentimentIntensityAnalyzer':
+    global _sentiment_analyzer
+    if _sentiment_analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+
+        _sentiment_analyzer = SentimentIntensityAnalyzer()
+    return _sentiment_analyzer
+
+
+# number of equal slices of the text the sentiment distribution is reported over
+SENTIMENT_SECTIONS = 10
+
+
+@dataclass
+class SentimentSummary:
+    compound: float                # length-weighted mean compound, -1..1
+    mean: float                    # unweighted mean compound over sentences
+    variance: float                # spread of sentence compounds: high for mixed sentiment
+    sections: list[float]          # length-weighted compound per slice of the text, in order
+    sentence_count: int
+
+
+@dataclass
+class TextMetrics:
+    sentiment_score: float
+    sentiment_label: str
+    readability_score: float
+    readability_level: str
+    readability_comment: str
+    sentiment: Optional[SentimentSummary] = None
+
+
+# ------------------------------------------------------------
+# Sentiment Analysis
+# ------------------------------------------------------------
+def split_sentences(text: str) -> list[str]:
+    return [sentence for sentence in (part.strip() for part in SENTENCE_END.split(text)) if sentence]
+
+
+def sentence_sentiment(text: str, sections: int = SENTIMENT_SECTIONS) -> SentimentSummary:
+    """
+    Scores each sentence with VADER, which is built for sentence-sized input,
+    and aggregates the scores with NumPy. Repeated sentences (boilerplate,
+    navigation) are scored once.
+    """
+    import numpy as np
+
+    sentences = split_sentences(text)
+    if not sentences:
+        return SentimentSummary(0.0, 0.0, 0.0, [], 0)
+
+    analyzer = _get_sentiment_analyzer()
+    scores: dict[str, float] = {}
+    for sentence in sentences:
+        if sentence not in scores:
+            scores[sentence] = analyzer.polarity_scores(sentence)['compound']
+
+    compounds = np.fromiter((scores[sentence] for sentence in sentences), dtype=np.float64, count=len(sentences))
+    lengths = np.fromiter((len(sentence) for sentence in sentences), dtype=np.float64, count=len(sentences))
+
+    section_compounds = [
+        float(np.average(section_scores, weights=section_lengths))
+        for section_scores, section_lengths in zip(np.array_split(compounds, sections), np.array_split(lengths, sections))
+        if section_scores.size
+    ]
+
+    return SentimentSummary(
+        compound=float(np.average(compounds, weights=lengths)),
+        mean=float(compounds.mean()),
+        variance=float(compounds.var()),
+        sections=[round(value, 4) for value in section_compounds],
+        sentence_count=len(sentences),
+    )
+
+
+def sentiment_label(compound: float) -> tuple[int, str]:
+    # Convert -1..1 → 0..100
+    score_0_100 = round((compound + 1) * 50)
+
+    # Label
+    if compound >= 0.35:
+        label = "Positive"
+    elif compound <= -0.35:
+        label = "Negative"
+    else:
+        label = "Neutral"
+
+    return score_0_100, label
+
+
+def compute_sentiment(text: str) -> tuple[int, str]:
+    """ Whole-text VADER score, the original single-call version. """
+    return sentiment_label(_get_sentiment_analyzer().polarity_scores(text)["compound"])
+
+
+# ------------------------------------------------------------
+# Readability Analysis
+# ------------------------------------------------------------
+def compute_readability(text: str) -> tuple[float, str, str]:
+    import textstat
+
+    try:
+        score = textstat.flesch_reading_ease(text)
+    except:
+        score = 50  # fallback mid-value
+
+    if score < 0:
+        score = 0
+    if score > 100:
+        score = 100
+
+    # Assign human-readable category + comment
+    if score >= 70:
+        level = "Easy"
+        comment = "The content is easy to read and suitable for most audiences."
+    elif score >= 50:
+        level = "Medium"
+        comment = "The content has moderate complexity and may require focus."
+    else:
+        level = "Hard"
+        comment = "The content is difficult to read and may need simplification."
+
+    return round(score, 2), level, comment
+
+
+def compute_metrics(text: str) -> TextMetrics:
+    sentiment = sentence_sentiment(text)
+    score, label = sentiment_label(sentiment.compound)
+    readability_score, readability_level, readability_comment = compute_readability(text)
+    return TextMetrics(score, label, readability_score, readability_level, readability_comment, sentiment)
+
+
+class LocalMetrics:
+    """
+    Computes the local (non-LLM) text metrics off the event loop.
+
+    Texts up to process_threshold characters run in a worker thread; longer
+    ones, where VADER and textstat would hold the GIL for a noticeable time,
+    run in a process pool. Results are cached by text hash, and concurrent
+    requests for the same text share one computation.
+    """
+
+    def __init__(self, process_threshold: int = 20000, max_workers: int = 2, cache_size: int = 1024):
+        self.process_threshold = process_threshold
+        self.max_workers = max_workers
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._cache: LRUCache = LRUCache(maxsize=cache_size)
+        self._flight = SingleFlight()
+        self.hits = 0
+        self.misses = 0
+        self.offloaded = 0
+
+    def _process_pool(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # spawn: forking a server process that already runs threads is not safe
+            self._executor = ProcessPoolExecutor(self.max_workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._executor
+
+    async def _compute(self, key: str, text: str) -> TextMetrics:
+        if len(text) > self.process_threshold and self.max_workers > 0:
+            self.offloaded += 1
+            metrics = await asyncio.get_running_loop().run_in_executor(self._process_pool(), compute_metrics, text)
+        else:
+            metrics = await asyncio.to_thread(compute_metrics, text)
+        self._cache[key] = metrics
+        return metrics
+
+    async def warm_up(self):
+        """ Loads the libraries and lexicons here and in the worker processes, so the first text does not pay for it. """
+        await asyncio.to_thread(compute_metrics, 'Warm up.')
+        if self.max_workers > 0:
+            loop = asyncio.get_running_loop()
+            await asyncio.gather(*(
+                loop.run_in_executor(self._process_pool(), compute_metrics, 'Warm up.')
+                for _ in range(self.max_workers)
+            ))
+
+    async def compute(self, text: str) -> TextMetrics:
+        with stage_timer('local_metrics'):
+            key = hashlib.sha256(text.encode('utf-8')).hexdigest()
+            metrics = self._cache.get(key)
+            if metrics is not None:
+                self.hits += 1
+                return metrics
+
+            self.misses += 1
+            return await self._flight.do(key, lambda: self._compute(key, text))
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown(cancel_futures=True)
+            self._executor = None
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'hits': self.hits,
+            'misses': self.misses,
+            'offloaded': self.offloaded,
+        }
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+
+class Throttle:
+    """
+    Token bucket limiting how often an operation may start: `rate` per second
+    on average, with bursts of up to `burst`. Callers wait their turn in order.
+    A rate of 0 disables the throttle.
+    """
+
+    def __init__(self, rate: float, burst: int = 1):
+        self.rate = rate
+        self.burst = max(1, burst)
+        self._tokens = float(self.burst)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+        self.waits = 0
+        self.wait_time = 0.0
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+
+        async with self._lock:
+            now = time.monotonic()
+            self._tokens = min(self.burst, self._tokens + (now - self._updated) * self.rate)
+            self._updated = now
+
+            if self._tokens < 1:
+                delay = (1 - self._tokens) / self.rate
+                self.waits += 1
+                self.wait_time += delay
+                await asyncio.sleep(delay)
+                self._tokens = 1.0
+                self._updated = time.monotonic()
+
+            self._tokens -= 1
+
+    @property
+    def stats(self) -> dict:
+        return {
+            'rate': self.rate,
+            'waits': self.waits,
+            'wait_time': round(self.wait_time, 3),
+        }
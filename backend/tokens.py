@@ -0,0 +1,18 @@
+import math
+
+# rough average for English prose with Gemini's tokenizer; good enough for budgeting
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """ Cuts text to roughly max_tokens, at a word boundary where possible. """
+    max_chars = max_tokens * CHARS_PER_TOKEN
+    if len(text) <= max_chars:
+        return text
+
+    cut = text.rfind(' ', 0, max_chars + 1)
+    return text[:cut if cut > 0 else max_chars]
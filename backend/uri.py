@@ -0,0 +1,39 @@
+from urllib.parse import parse_qsl, urlencode, urlsplit, urlunsplit
+
+DEFAULT_PORTS = {'http': 80, 'https': 443}
+
+# query parameters that only track the visitor and never change the page
+TRACKING_PARAMS = {'fbclid', 'gclid', 'dclid', 'msclkid', 'mc_cid', 'mc_eid', '_ga'}
+
+
+def normalize_uri(uri: str) -> str:
+    """ Normalize a URI so that trivially different spellings of the same page share cache entries. """
+    parts = urlsplit(uri.strip())
+
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or '').lower()
+
+    netloc = host
+    if parts.port and parts.port != DEFAULT_PORTS.get(scheme):
+        netloc = f'{host}:{parts.port}'
+    if parts.username:
+        userinfo = parts.username if parts.password is None else f'{parts.username}:{parts.password}'
+        netloc = f'{userinfo}@{netloc}'
+
+    path = parts.path or '/'
+
+    # the fragment is never sent to the server
+    return urlunsplit((scheme, netloc, path, parts.query, ''))
+
+
+def canonicalize_uri(uri: str) -> str:
+    """ Normalized URI with utm_* and other tracking parameters removed, used as the cache key for a page. """
+    parts = urlsplit(normalize_uri(uri))
+
+    query = [
+        (name, value)
+        for name, value in parse_qsl(parts.query, keep_blank_values=True)
+        if not name.lower().startswith('utm_') and name.lower() not in TRACKING_PARAMS
+    ]
+
+    return urlunsplit((parts.scheme, parts.netloc, parts.path, urlencode(query), ''))
@@ -0,0 +1,88 @@
+"""
+Benchmark of the HTML-to-text extractors on the saved pages in benchmarks/pages.
+
+Each page is extracted as-is and padded to --size bytes (the page body repeated,
+like a long article at parse_max_content_length). The lxml extractor is fed in
+--chunk-size pieces, the way WebParser feeds it from the network. The report
+shows the median time per extractor and whether its output matches the
+BeautifulSoup extractor.
+
+Usage:
+    python -m benchmarks.extract --size 1048576 --repeat 5
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import Counter
+from pathlib import Path
+
+from backend.extract import LxmlExtractor, SoupExtractor, TextExtractor
+
+PAGES_DIR = Path(__file__).parent / 'pages'
+
+
+def pad_page(html: str, size: int) -> str:
+    """ Repeats the page body until the document is about `size` characters long. """
+    start = html.index('<body')
+    start = html.index('>', start) + 1
+    end = html.rindex('</body>')
+    body = html[start:end]
+
+    repeats = max(1, (size - len(html)) // len(body) + 1)
+    return html[:start] + body * repeats + html[end:]
+
+
+def run(extractor: type[TextExtractor], html: str, chunk_size: int) -> str:
+    instance = extractor()
+    for i in range(0, len(html), chunk_size):
+        instance.feed(html[i:i + chunk_size])
+    return instance.close()
+
+
+def word_overlap(a: str, b: str) -> float:
+    words_a, words_b = Counter(a.split()), Counter(b.split())
+    total = max(sum(words_a.values()), sum(words_b.values()))
+    return sum((words_a & words_b).values()) / total if total else 1.0
+
+
+def measure(extractor: type[TextExtractor], html: str, chunk_size: int, repeat: int) -> tuple[float, str]:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        text = run(extractor, html, chunk_size)
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), text
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--size', type=int, default=1048576)
+    arg_parser.add_argument('--chunk-size', type=int, default=8192)
+    arg_parser.add_argument('--repeat', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    results = []
+    for path in sorted(PAGES_DIR.glob('*.html')):
+        original = path.read_text(encoding='utf-8')
+
+        for label, html in (('original', original), ('padded', pad_page(original, args.size))):
+            soup_seconds, soup_text = measure(SoupExtractor, html, args.chunk_size, args.repeat)
+            lxml_seconds, lxml_text = measure(LxmlExtractor, html, args.chunk_size, args.repeat)
+
+            results.append({
+                'page': path.name,
+                'variant': label,
+                'bytes': len(html.encode('utf-8')),
+                'soup_ms': round(soup_seconds * 1000, 2),
+                'lxml_ms': round(lxml_seconds * 1000, 2),
+                'speedup': round(soup_seconds / lxml_seconds, 2) if lxml_seconds else None,
+                'identical': soup_text == lxml_text,
+                'word_overlap': round(word_overlap(soup_text, lxml_text), 4),
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
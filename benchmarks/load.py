@@ -0,0 +1,165 @@
+"""
+Load benchmark for the /analyze request path.
+
+Compares the old blocking pipeline (requests + sync Gemini call on a bounded
+threadpool, like FastAPI runs sync `def` handlers) with the async pipeline
+(WebParser.parse + BiasAnalyzer.analyze on the event loop).
+
+The model is stubbed with a fixed latency and pages are served from a local
+HTTP fixture server, so no network or Vertex AI access is needed.
+
+Usage:
+    python -m benchmarks.load --requests 400 --page-delay 0.2 --model-delay 2.0
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import requests
+
+from backend.bias import BiasAnalyzer
+from backend.fetch import Fetcher
+from backend.parse import WebParser
+from backend.textmetrics import compute_readability, compute_sentiment
+
+# FastAPI / anyio default threadpool size used for sync handlers
+THREADPOOL_SIZE = 40
+
+PAGE = (
+    '<html><head><title>Fixture</title></head><body>'
+    + ''.join(f'<p>She and he wrote paragraph {i} about engineers and nurses.</p>' for i in range(50))
+    + '</body></html>'
+).encode()
+
+STUB_RESPONSE = json.dumps({
+    'summary': 'stub',
+    'stereotyping_feedback': '', 'stereotyping_score': 70, 'stereotyping_example': '',
+    'representation_feedback': '', 'representation_score': 70, 'representation_example': '',
+    'language_feedback': '', 'language_score': 70, 'language_example': '',
+    'framing_feedback': '', 'framing_score': 70, 'framing_example': '',
+    'positive_aspects': '', 'improvement_suggestions': '',
+    'male_to_female_mention_ratio': 1.0, 'gender_neutral_language_percentage': 50.0,
+})
+
+
+class StubGeminiClient:
+    """ Stands in for GeminiClient with a fixed response latency. """
+
+    def __init__(self, delay: float, max_concurrency: int):
+        self.model_name = 'stub'
+        self.delay = delay
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+
+    async def start_chat(self):
+        return None
+
+    def get_chat_response(self, chat, prompt: str) -> str:
+        time.sleep(self.delay)
+        return STUB_RESPONSE
+
+    async def get_chat_response_async(self, chat, prompt: str) -> str:
+        async with self._semaphore:
+            await asyncio.sleep(self.delay)
+            return STUB_RESPONSE
+
+    async def get_chat_response_parsed(self, chat, prompt: str, parser_factory):
+        parser = parser_factory()
+        parser.feed(await self.get_chat_response_async(chat, prompt))
+        return parser
+
+
+def start_fixture_server(delay: float) -> ThreadingHTTPServer:
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            time.sleep(delay)
+            # every path gets distinct text so requests are not coalesced
+            body = PAGE.replace(b'</body>', f'<p>{self.path}</p></body>'.encode())
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def run_sync(uri: str, n: int, model: StubGeminiClient, parser: WebParser) -> float:
+    def handle(i):
+        with requests.get(f'{uri}?n={i}', stream=True) as response:
+            response.raise_for_status()
+            html = response.text
+        text = parser.extractor.extract(html)
+        model.get_chat_response(None, text)
+        compute_sentiment(text)
+        compute_readability(text)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=THREADPOOL_SIZE) as pool:
+        list(pool.map(handle, range(n)))
+    return time.perf_counter() - start
+
+
+async def run_async(uri: str, n: int, parser: WebParser, analyzer: BiasAnalyzer) -> float:
+    async def handle(i):
+        text = await parser.parse(f'{uri}?n={i}')
+        await analyzer.analyze(text)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(handle(i) for i in range(n)))
+    return time.perf_counter() - start
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--requests', type=int, default=400)
+    arg_parser.add_argument('--page-delay', type=float, default=0.2)
+    arg_parser.add_argument('--model-delay', type=float, default=2.0)
+    arg_parser.add_argument('--fetch-concurrency', type=int, default=100)
+    arg_parser.add_argument('--model-concurrency', type=int, default=100)
+    args = arg_parser.parse_args()
+
+    server = start_fixture_server(args.page_delay)
+    uri = f'http://127.0.0.1:{server.server_port}/page.html'
+
+    # every request goes to the one fixture host, so lift the per-host cap as well
+    fetcher = Fetcher(per_host_concurrency=args.fetch_concurrency, max_connections=args.fetch_concurrency)
+    parser = WebParser(1048576, 8192, max_concurrency=args.fetch_concurrency, fetcher=fetcher)
+    model = StubGeminiClient(args.model_delay, args.model_concurrency)
+    analyzer = BiasAnalyzer(model)
+
+    # load VADER / textstat dictionaries before timing either pipeline
+    warmup_text = parser.extractor.extract(PAGE.decode())
+    compute_sentiment(warmup_text)
+    compute_readability(warmup_text)
+
+    sync_elapsed = run_sync(uri, args.requests, model, parser)
+    async_elapsed = asyncio.run(run_async(uri, args.requests, parser, analyzer))
+    server.shutdown()
+
+    report = {
+        'requests': args.requests,
+        'sync_seconds': round(sync_elapsed, 3),
+        'sync_rps': round(args.requests / sync_elapsed, 2),
+        'async_seconds': round(async_elapsed, 3),
+        'async_rps': round(args.requests / async_elapsed, 2),
+        'speedup': round(sync_elapsed / async_elapsed, 2),
+    }
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
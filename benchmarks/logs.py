@@ -0,0 +1,113 @@
+"""
+Benchmark of what a log call costs the thread that makes it: the old
+setup (FileHandler and StreamHandler attached to the module logger,
+written on the caller's thread) against backend/logs.py (queue handler,
+background writer, JSON file with rotation).
+
+--threads threads each log --records records: an info line per record
+and, every --error-every records, a logger.exception with a traceback, as
+a failing model call does. The report gives the per-call latency seen by
+the callers and the total wall time. Console output goes to /dev/null for
+both setups, so the terminal's speed does not count.
+
+Usage:
+    python -m benchmarks.logs --threads 32 --records 2000
+"""
+import argparse
+import json
+import logging
+import os
+import sys
+import tempfile
+import threading
+import time
+
+from backend.logs import setup_logging
+from backend.stats import LatencyStats
+
+
+def fail():
+    raise RuntimeError('503 Service Unavailable')
+
+
+def hammer(logger: logging.Logger, threads: int, records: int, error_every: int) -> dict:
+    latency = LatencyStats(window=threads * records)
+    lock = threading.Lock()
+
+    def worker(n: int):
+        timings = []
+        for i in range(records):
+            start = time.perf_counter()
+            if error_every and i % error_every == 0:
+                try:
+                    fail()
+                except RuntimeError as e:
+                    logger.exception('Failed to analyze %s: %s', f'http://example.com/{n}/{i}', str(e))
+            else:
+                logger.info('Analyzing %s', f'http://example.com/{n}/{i}')
+            timings.append(time.perf_counter() - start)
+        with lock:
+            for seconds in timings:
+                latency.record(seconds)
+
+    start = time.perf_counter()
+    pool = [threading.Thread(target=worker, args=(n,)) for n in range(threads)]
+    for thread in pool:
+        thread.start()
+    for thread in pool:
+        thread.join()
+    elapsed = time.perf_counter() - start
+
+    summary = latency.stats
+    return {
+        'seconds': round(elapsed, 3),
+        'call_us': {key: round(summary[key] * 1e6, 1) for key in ('mean', 'p50', 'p99', 'max')},
+    }
+
+
+def file_handler_logger(path: str, stream) -> logging.Logger:
+    # as main.py used to set itself up
+    logger = logging.getLogger('benchmark.file_handler')
+    logger.setLevel(logging.DEBUG)
+    logger.propagate = False
+    formatter = logging.Formatter('%(asctime)s:%(name)s:%(message)s')
+    file_handler = logging.FileHandler(path)
+    file_handler.setFormatter(formatter)
+    stream_handler = logging.StreamHandler(stream)
+    stream_handler.setFormatter(formatter)
+    logger.addHandler(file_handler)
+    logger.addHandler(stream_handler)
+    return logger
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--threads', type=int, default=32)
+    arg_parser.add_argument('--records', type=int, default=2000)
+    arg_parser.add_argument('--error-every', type=int, default=20)
+    args = arg_parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir, open(os.devnull, 'w') as devnull:
+        sync_logger = file_handler_logger(os.path.join(workdir, 'sync.log'), devnull)
+        sync = hammer(sync_logger, args.threads, args.records, args.error_every)
+
+        stderr, sys.stderr = sys.stderr, devnull
+        try:
+            listener = setup_logging('benchmark.queue', path=os.path.join(workdir, 'queue.log'))
+            queue_start = time.perf_counter()
+            queued = hammer(logging.getLogger('benchmark.queue'), args.threads, args.records, args.error_every)
+            listener.stop()
+            queued['drained_seconds'] = round(time.perf_counter() - queue_start, 3)
+        finally:
+            sys.stderr = stderr
+
+    print(json.dumps({
+        'threads': args.threads,
+        'records_per_thread': args.records,
+        'file_handler': sync,
+        'queue_handler': queued,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
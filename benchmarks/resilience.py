@@ -0,0 +1,153 @@
+"""
+Deterministic check of the model call policy (backend/resilience.py) against
+the in-process fake model (backend/fake.py), no network or quota needed.
+
+Scenarios: transient 503/429 errors are retried; a bad request is not; a
+stalled call hits its deadline; a sustained outage opens the circuit breaker,
+which then fails fast and recovers through a half-open trial; hedging trims
+the latency tail. Each scenario prints its numbers and whether its checks
+passed; the exit status is non-zero if any failed.
+
+Usage:
+    python -m benchmarks.resilience
+"""
+import asyncio
+import json
+import random
+import sys
+import time
+
+from google.api_core import exceptions as api_exceptions
+
+from backend.fake import FakeGenerativeModel
+from backend.gemini import GeminiClient
+from backend.resilience import CallPolicy, CircuitBreaker, CircuitOpenError
+from backend.stats import LatencyStats
+
+
+def make_client(model: FakeGenerativeModel, **policy) -> GeminiClient:
+    breaker = CircuitBreaker(policy.pop('failure_threshold', 5), policy.pop('reset_timeout', 30.0))
+    call_policy = CallPolicy(backoff=0.01, max_backoff=0.05, breaker=breaker, rng=random.Random(0), **policy)
+    return GeminiClient(None, 'fake', max_concurrency=64, policy=call_policy, generative_model=model)
+
+
+async def call(client: GeminiClient) -> tuple[str, float]:
+    start = time.perf_counter()
+    try:
+        await client.get_chat_response_async(await client.start_chat(), 'prompt')
+        outcome = 'ok'
+    except Exception as e:
+        outcome = type(e).__name__
+    return outcome, time.perf_counter() - start
+
+
+async def transient_errors() -> dict:
+    model = FakeGenerativeModel(outcomes=[api_exceptions.ServiceUnavailable('down'), api_exceptions.TooManyRequests('slow down'), None])
+    client = make_client(model)
+    outcome, _ = await call(client)
+    return {
+        'outcome': outcome,
+        'model_calls': model.calls,
+        'retries': client.policy.retries,
+        'passed': outcome == 'ok' and client.policy.retries == 2,
+    }
+
+
+async def client_error() -> dict:
+    model = FakeGenerativeModel(outcomes=[api_exceptions.InvalidArgument('bad request')])
+    client = make_client(model)
+    outcome, _ = await call(client)
+    return {
+        'outcome': outcome,
+        'model_calls': model.calls,
+        'circuit': client.policy.breaker.state,
+        'passed': outcome == 'InvalidArgument' and model.calls == 1 and client.policy.breaker.state == CircuitBreaker.CLOSED,
+    }
+
+
+async def deadline() -> dict:
+    model = FakeGenerativeModel(latency=1.0)
+    client = make_client(model, timeout=0.1, max_retries=0)
+    outcome, seconds = await call(client)
+    return {
+        'outcome': outcome,
+        'seconds': round(seconds, 3),
+        'passed': outcome == 'TimeoutError' and seconds < 0.5,
+    }
+
+
+async def outage() -> dict:
+    model = FakeGenerativeModel(error_rate=1.0)
+    client = make_client(model, max_retries=5, failure_threshold=3, reset_timeout=0.2)
+
+    first, _ = await call(client)
+    calls_before = model.calls
+    rejected, rejected_seconds = await call(client)
+    calls_while_open = model.calls - calls_before
+
+    # backend comes back; after reset_timeout a trial call closes the circuit
+    model.error_rate = 0.0
+    await asyncio.sleep(0.25)
+    recovered, _ = await call(client)
+
+    return {
+        'first_call': first,
+        'model_calls_before_open': calls_before,
+        'while_open': rejected,
+        'fail_fast_ms': round(rejected_seconds * 1000, 3),
+        'model_calls_while_open': calls_while_open,
+        'after_reset': recovered,
+        'circuit': client.policy.breaker.state,
+        'passed': (
+            first == 'ServiceUnavailable' and calls_before == 3
+            and rejected == CircuitOpenError.__name__ and calls_while_open == 0
+            and recovered == 'ok' and client.policy.breaker.state == CircuitBreaker.CLOSED
+        ),
+    }
+
+
+async def tail_latency(hedge_after: float, calls: int) -> dict:
+    model = FakeGenerativeModel(latency=0.01, tail_latency=0.5, tail_rate=0.05, seed=1)
+    client = make_client(model, hedge_after=hedge_after)
+    latency = LatencyStats()
+    for _ in range(calls):
+        _, seconds = await call(client)
+        latency.record(seconds)
+    return {
+        'p50_ms': round(latency.percentile(50) * 1000, 1),
+        'p99_ms': round(latency.percentile(99) * 1000, 1),
+        'max_ms': round(latency.max * 1000, 1),
+        'model_calls': model.calls,
+        'hedges': client.policy.hedges,
+    }
+
+
+async def hedging() -> dict:
+    plain = await tail_latency(0.0, 200)
+    hedged = await tail_latency(0.05, 200)
+    return {
+        'without_hedging': plain,
+        'with_hedging': hedged,
+        'passed': hedged['p99_ms'] < plain['p99_ms'] / 2,
+    }
+
+
+async def run() -> dict:
+    return {
+        'transient_errors': await transient_errors(),
+        'client_error': await client_error(),
+        'deadline': await deadline(),
+        'outage': await outage(),
+        'hedging': await hedging(),
+    }
+
+
+def main():
+    results = asyncio.run(run())
+    print(json.dumps(results, indent=2))
+    if not all(result['passed'] for result in results.values()):
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,75 @@
+"""
+Benchmark of whole-text VADER scoring (one polarity_scores call over the page,
+as before) against sentence-level scoring with NumPy aggregation, on the saved
+pages in benchmarks/pages padded to --size bytes of markup.
+
+The padded page repeats the article body, so the sentence scorer also shows
+what deduplicating repeated sentences buys on boilerplate-heavy pages. The
+report gives the median time of each and the resulting scores. Whole-text
+scoring grows roughly quadratically with the text, so at the default 1 MiB a
+run takes several minutes per page.
+
+Usage:
+    python -m benchmarks.sentiment --size 1048576 --repeat 3
+"""
+import argparse
+import json
+import statistics
+import time
+from pathlib import Path
+
+from backend.extract import LxmlExtractor
+from backend.textmetrics import _get_sentiment_analyzer, sentence_sentiment, sentiment_label
+
+from .extract import pad_page
+
+PAGES_DIR = Path(__file__).parent / 'pages'
+
+
+def median_time(fn, repeat: int):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = fn()
+        timings.append(time.perf_counter() - start)
+    return statistics.median(timings), result
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--size', type=int, default=1048576)
+    arg_parser.add_argument('--repeat', type=int, default=3)
+    args = arg_parser.parse_args()
+
+    analyzer = _get_sentiment_analyzer()
+    results = []
+    for path in sorted(PAGES_DIR.glob('*.html')):
+        html = pad_page(path.read_text(encoding='utf-8'), args.size)
+        text = LxmlExtractor.extract(html)
+
+        whole_seconds, whole = median_time(lambda: analyzer.polarity_scores(text)['compound'], args.repeat)
+        sentence_seconds, summary = median_time(lambda: sentence_sentiment(text), args.repeat)
+
+        results.append({
+            'page': path.name,
+            'html_bytes': len(html.encode('utf-8')),
+            'text_chars': len(text),
+            'sentences': summary.sentence_count,
+            'whole_text_ms': round(whole_seconds * 1000, 1),
+            'sentence_level_ms': round(sentence_seconds * 1000, 1),
+            'speedup': round(whole_seconds / sentence_seconds, 2) if sentence_seconds else None,
+            'whole_text': {'compound': whole, 'label': sentiment_label(whole)[1]},
+            'sentence_level': {
+                'compound': round(summary.compound, 4),
+                'label': sentiment_label(summary.compound)[1],
+                'mean': round(summary.mean, 4),
+                'variance': round(summary.variance, 4),
+                'sections': summary.sections,
+            },
+        })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,268 @@
+"""
+End-to-end load test of the HTTP service without Vertex AI or live websites.
+
+Starts the app under uvicorn with GEMINI_BACKEND=fake (backend/fake.py, with
+the latency, chunking and error rate given here) and serves the recorded
+pages in benchmarks/pages from a local HTTP server. Then it drives
+/ParsedText, /analyze and /EnhancedText in turn, each with --requests
+requests at --concurrency.
+
+Each URI gets a query string so pages are fetched and analyzed afresh;
+--distinct N reuses N URIs instead, to measure the cached path. The report
+is JSON: per endpoint the throughput, latency percentiles and errors, plus
+the server's resident memory (current and peak, worker processes
+included). Write it to --output to compare runs between commits.
+
+Usage:
+    python -m benchmarks.service --requests 200 --concurrency 32 --model-latency 0.5 --output bench.json
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Optional
+
+import httpx
+
+from backend.fake import DEFAULT_RESPONSE
+from backend.stats import LatencyStats
+
+ROOT = Path(__file__).parent.parent
+PAGES_DIR = Path(__file__).parent / 'pages'
+ENDPOINTS = ('ParsedText', 'analyze', 'EnhancedText')
+
+
+def start_page_server(delay: float) -> ThreadingHTTPServer:
+    pages = {f'/{path.name}': path.read_bytes() for path in sorted(PAGES_DIR.glob('*.html'))}
+
+    class Handler(BaseHTTPRequestHandler):
+        def do_GET(self):
+            body = pages.get(self.path.split('?')[0])
+            if body is None:
+                self.send_error(404)
+                return
+            if delay:
+                time.sleep(delay)
+            self.send_response(200)
+            self.send_header('Content-Type', 'text/html; charset=utf-8')
+            self.send_header('Content-Length', str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def log_message(self, *args):
+            pass
+
+    class Server(ThreadingHTTPServer):
+        daemon_threads = True
+        request_queue_size = 1024
+
+    server = Server(('127.0.0.1', 0), Handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def start_service(args, port: int, workdir: str) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        'PYTHONPATH': str(ROOT),
+        'GCP_PROJECT_ID': 'benchmark',
+        'GCP_LOCATION': 'us-central1',
+        'GCP_SERVICE_ACCOUNT_FILE': '',
+        'GEMINI_BACKEND': 'fake',
+        'FAKE_LATENCY': str(args.model_latency),
+        'FAKE_CHUNK_SIZE': str(args.model_chunk_size),
+        'FAKE_CHUNK_DELAY': str(args.model_chunk_delay),
+        'FAKE_ERROR_RATE': str(args.model_error_rate),
+        'MODEL_CONCURRENCY': str(args.concurrency),
+        'PARSE_DEFAULT_STRATEGY': 'static',
+        # every page comes from the one local host
+        'FETCH_CONCURRENCY': str(args.concurrency),
+        'FETCH_PER_HOST_CONCURRENCY': str(args.concurrency),
+        'CACHE_BACKEND': 'memory',
+        'LIMIT_BACKEND': 'memory',
+        'DAILY_LIMIT': '0',
+        'MODEL_DAILY_LIMIT': '0',
+        'MODEL_DAILY_LIMIT2': '0',
+        'JOBS_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+    }
+    # the working directory keeps the service's log files out of the checkout
+    return subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=workdir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+async def wait_ready(client: httpx.AsyncClient, process: subprocess.Popen, timeout: float = 60.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'Service exited with status {process.returncode}')
+        try:
+            if (await client.get('/stats')).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        await asyncio.sleep(0.1)
+    raise RuntimeError('Service did not start in time')
+
+
+def _process_tree(pid: int) -> list[int]:
+    pids = [pid]
+    try:
+        children = Path(f'/proc/{pid}/task/{pid}/children').read_text().split()
+    except OSError:
+        return pids
+    for child in children:
+        pids.extend(_process_tree(int(child)))
+    return pids
+
+
+def memory_mb(pid: int) -> Optional[dict]:
+    """ Resident memory of the server and its worker processes, from /proc (Linux only). """
+    rss = peak = 0
+    for process in _process_tree(pid):
+        try:
+            status = Path(f'/proc/{process}/status').read_text()
+        except OSError:
+            continue
+        fields = dict(line.split(':', 1) for line in status.splitlines() if ':' in line)
+        rss += int(fields.get('VmRSS', '0 kB').split()[0])
+        peak += int(fields.get('VmHWM', '0 kB').split()[0])
+    if not rss:
+        return None
+    return {'rss_mb': round(rss / 1024, 1), 'peak_rss_mb': round(peak / 1024, 1)}
+
+
+def request_body(endpoint: str, uri: str) -> dict:
+    if endpoint == 'EnhancedText':
+        return {'uri': uri, 'result': json.loads(DEFAULT_RESPONSE)}
+    return {'uri': uri}
+
+
+async def drive(client: httpx.AsyncClient, endpoint: str, uris: list[str], concurrency: int) -> dict:
+    latency = LatencyStats(window=len(uris))
+    statuses: dict[int, int] = {}
+    pending = iter(uris)
+
+    async def worker():
+        for uri in pending:
+            start = time.perf_counter()
+            try:
+                response = await client.post(f'/{endpoint}', json=request_body(endpoint, uri))
+                status = response.status_code
+            except httpx.TransportError:
+                status = 0
+            latency.record(time.perf_counter() - start, error=status != 200)
+            statuses[status] = statuses.get(status, 0) + 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    summary = latency.stats
+    return {
+        'requests': len(uris),
+        'errors': summary['errors'],
+        'statuses': {str(status): count for status, count in sorted(statuses.items())},
+        'seconds': round(elapsed, 3),
+        'throughput_rps': round(len(uris) / elapsed, 2),
+        'latency_ms': {key: round(summary[key] * 1000, 1) for key in ('mean', 'p50', 'p95', 'p99', 'max')},
+    }
+
+
+def page_uris(base: str, endpoint: str, requests: int, distinct: int) -> list[str]:
+    names = [path.name for path in sorted(PAGES_DIR.glob('*.html'))]
+    uris = []
+    for i in range(requests):
+        n = i % distinct if distinct else i
+        uris.append(f'{base}/{names[n % len(names)]}?{endpoint}={n}')
+    return uris
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+async def run(args) -> dict:
+    page_server = start_page_server(args.page_delay)
+    base = f'http://127.0.0.1:{page_server.server_port}'
+    port = free_port()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        process = start_service(args, port, workdir)
+        try:
+            limits = httpx.Limits(max_connections=args.concurrency)
+            async with httpx.AsyncClient(base_url=f'http://127.0.0.1:{port}', timeout=args.timeout, limits=limits) as client:
+                await wait_ready(client, process)
+                idle = memory_mb(process.pid)
+
+                endpoints = {}
+                for endpoint in args.endpoints:
+                    uris = page_uris(base, endpoint, args.requests, args.distinct)
+                    endpoints[endpoint] = await drive(client, endpoint, uris, args.concurrency)
+                    endpoints[endpoint]['memory'] = memory_mb(process.pid)
+        finally:
+            process.terminate()
+            process.wait()
+            page_server.shutdown()
+
+    return {
+        'commit': git_commit(),
+        'config': {
+            'requests': args.requests,
+            'concurrency': args.concurrency,
+            'distinct': args.distinct,
+            'page_delay': args.page_delay,
+            'model_latency': args.model_latency,
+            'model_chunk_size': args.model_chunk_size,
+            'model_chunk_delay': args.model_chunk_delay,
+            'model_error_rate': args.model_error_rate,
+        },
+        'idle_memory': idle,
+        'endpoints': endpoints,
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--requests', type=int, default=200)
+    arg_parser.add_argument('--concurrency', type=int, default=32)
+    arg_parser.add_argument('--distinct', type=int, default=0, help='number of distinct URIs, 0 = all distinct')
+    arg_parser.add_argument('--endpoints', nargs='+', choices=ENDPOINTS, default=list(ENDPOINTS))
+    arg_parser.add_argument('--page-delay', type=float, default=0.05)
+    arg_parser.add_argument('--model-latency', type=float, default=0.5)
+    arg_parser.add_argument('--model-chunk-size', type=int, default=64)
+    arg_parser.add_argument('--model-chunk-delay', type=float, default=0.01)
+    arg_parser.add_argument('--model-error-rate', type=float, default=0.0)
+    arg_parser.add_argument('--timeout', type=float, default=120.0)
+    arg_parser.add_argument('--output', help='also write the report to this file')
+    args = arg_parser.parse_args()
+
+    report = asyncio.run(run(args))
+    text = json.dumps(report, indent=2)
+    print(text)
+    if args.output:
+        Path(args.output).write_text(text + '\n')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,126 @@
+"""
+Startup benchmark: how long a fresh worker takes to import backend.main and
+to answer its first request, and which heavy libraries it has loaded by then.
+
+Each run starts a new interpreter, so nothing is warm apart from the OS file
+cache. `import_ms` times `import backend.main` alone. `ready_ms` runs uvicorn
+and times from process start to the first 200 from /stats, which is what an
+autoscaled worker pays before it takes traffic. Runs use GEMINI_BACKEND=fake,
+so no credentials or network are needed; with the real backend, loading
+Vertex AI would come on top for an eager import.
+
+Usage:
+    python -m benchmarks.startup --runs 5
+"""
+import argparse
+import json
+import os
+import socket
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import httpx
+
+ROOT = Path(__file__).parent.parent
+
+HEAVY_MODULES = ('vertexai', 'selenium', 'webdriver_manager', 'bs4', 'vaderSentiment', 'textstat', 'numpy')
+
+IMPORT_SCRIPT = f"""
+import json, sys, time
+start = time.perf_counter()
+import backend.main
+elapsed = time.perf_counter() - start
+print(json.dumps({{
+    'import_ms': elapsed * 1000,
+    'loaded': [name for name in {HEAVY_MODULES!r} if name in sys.modules],
+}}))
+"""
+
+
+def service_env(workdir: str) -> dict:
+    return {
+        **os.environ,
+        'PYTHONPATH': str(ROOT),
+        'GCP_PROJECT_ID': 'benchmark',
+        'GCP_LOCATION': 'us-central1',
+        'GCP_SERVICE_ACCOUNT_FILE': '',
+        'GEMINI_BACKEND': 'fake',
+        'CACHE_BACKEND': 'memory',
+        'LIMIT_BACKEND': 'memory',
+        'JOBS_PATH': os.path.join(workdir, 'jobs.sqlite3'),
+    }
+
+
+def measure_import(workdir: str) -> dict:
+    output = subprocess.run(
+        [sys.executable, '-c', IMPORT_SCRIPT], cwd=workdir, env=service_env(workdir),
+        capture_output=True, text=True, check=True
+    ).stdout
+    return json.loads(output.strip().splitlines()[-1])
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def measure_ready(workdir: str, timeout: float = 60.0) -> float:
+    port = free_port()
+    start = time.perf_counter()
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'uvicorn', 'backend.main:app', '--port', str(port), '--log-level', 'warning'],
+        cwd=workdir, env=service_env(workdir), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        while time.perf_counter() - start < timeout:
+            if process.poll() is not None:
+                raise RuntimeError(f'Service exited with status {process.returncode}')
+            try:
+                if httpx.get(f'http://127.0.0.1:{port}/stats', timeout=1.0).status_code == 200:
+                    return (time.perf_counter() - start) * 1000
+            except httpx.TransportError:
+                pass
+            time.sleep(0.05)
+        raise RuntimeError('Service did not start in time')
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def summary(values: list[float]) -> dict:
+    return {
+        'median': round(statistics.median(values), 1),
+        'min': round(min(values), 1),
+        'max': round(max(values), 1),
+    }
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--runs', type=int, default=5)
+    args = arg_parser.parse_args()
+
+    imports, ready = [], []
+    loaded = []
+    with tempfile.TemporaryDirectory() as workdir:
+        for _ in range(args.runs):
+            result = measure_import(workdir)
+            imports.append(result['import_ms'])
+            loaded = result['loaded']
+            ready.append(measure_ready(workdir))
+
+    print(json.dumps({
+        'runs': args.runs,
+        'import_ms': summary(imports),
+        'ready_ms': summary(ready),
+        'heavy_modules_loaded_on_import': loaded,
+    }, indent=2))
+
+
+if __name__ == '__main__':
+    main()
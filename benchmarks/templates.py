@@ -0,0 +1,71 @@
+"""
+Microbenchmark of prompt rendering cost per call.
+
+Compares the previous renderer (a new Jinja Environment + FileSystemLoader on
+every call, so the template is re-read and recompiled each time) with the
+cached PromptTemplate used by BiasAnalyzer, for both prompts and a range of
+article sizes. Also checks that both produce the same prompt.
+
+Usage:
+    python -m benchmarks.templates --calls 200
+"""
+import argparse
+import json
+import os
+import timeit
+
+from jinja2 import Environment, FileSystemLoader
+
+import backend
+from backend.model import AnalyzeResult
+from backend.prompts import PromptLibrary
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(backend.__file__)), 'templates')
+
+ANALYZED_RESULT = AnalyzeResult(
+    summary='Mostly balanced.',
+    stereotyping_feedback='Some roles are gendered.', stereotyping_score=60, stereotyping_example='nurturing woman',
+    representation_feedback='Fair.', representation_score=70, representation_example='',
+    language_feedback='Uses he as default.', language_score=55, language_example='He will own',
+    framing_feedback='Neutral.', framing_score=75, framing_example='',
+    positive_aspects='Inclusive benefits.', improvement_suggestions='Use they.',
+    male_to_female_mention_ratio=1.4, gender_neutral_language_percentage=62.0,
+    sentiment_score=64, sentiment_label='Neutral', readability_level='Medium', readability_comment='Moderate.',
+)
+
+
+def render_uncached(template_name: str, **kwargs) -> str:
+    env = Environment(loader=FileSystemLoader(TEMPLATE_DIR))
+    return env.get_template(template_name).render(**kwargs)
+
+
+def main():
+    arg_parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    arg_parser.add_argument('--calls', type=int, default=200)
+    args = arg_parser.parse_args()
+
+    prompts = PromptLibrary(Environment(loader=FileSystemLoader(TEMPLATE_DIR), auto_reload=False))
+
+    results = []
+    for size in (1_000, 100_000, 1_000_000):
+        text = ('She is an engineer and he is a nurse. ' * (size // 38 + 1))[:size]
+
+        for template_name, context in (('analyze.jinja', {}), ('enhance.jinja', {'analyzedResult': ANALYZED_RESULT})):
+            assert render_uncached(template_name, text=text, **context) == prompts[template_name].render(text, **context)
+
+            uncached = timeit.timeit(lambda: render_uncached(template_name, text=text, **context), number=args.calls)
+            cached = timeit.timeit(lambda: prompts[template_name].render(text, **context), number=args.calls)
+
+            results.append({
+                'template': template_name,
+                'text_chars': size,
+                'uncached_us_per_call': round(uncached / args.calls * 1e6, 1),
+                'cached_us_per_call': round(cached / args.calls * 1e6, 1),
+                'speedup': round(uncached / cached, 1),
+            })
+
+    print(json.dumps(results, indent=2))
+
+
+if __name__ == '__main__':
+    main()
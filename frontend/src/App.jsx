@@ -9,6 +9,33 @@ export default function App() {
 
   const backend = "http://127.0.0.1:8000";
 
+  // reads a server-sent event stream from a fetch response, calling onEvent(event, data) per event
+  async function readEvents(response, onEvent) {
+    const reader = response.body.getReader();
+    const decoder = new TextDecoder();
+    let buffer = "";
+
+    while (true) {
+      const { value, done } = await reader.read();
+      if (done) break;
+      buffer += decoder.decode(value, { stream: true });
+
+      let boundary;
+      while ((boundary = buffer.indexOf("\n\n")) !== -1) {
+        const block = buffer.slice(0, boundary);
+        buffer = buffer.slice(boundary + 2);
+
+        let event = "message";
+        let data = "";
+        for (const line of block.split("\n")) {
+          if (line.startsWith("event: ")) event = line.slice(7);
+          if (line.startsWith("data: ")) data += line.slice(6);
+        }
+        onEvent(event, data ? JSON.parse(data) : null);
+      }
+    }
+  }
+
   async function handleRequest(type) {
     if (!url) return alert("Please enter a URL first!");
 
@@ -53,14 +80,22 @@ export default function App() {
 
         const analyzed = await analyzeFirst.json();
 
-        response = await fetch(`${backend}/EnhancedText`, {
+        // streamed, so the rewrite shows up as the model writes it
+        response = await fetch(`${backend}/EnhancedText/stream`, {
           method: "POST",
           headers: { "Content-Type": "application/json" },
           body: JSON.stringify(analyzed),
         });
-
-        const enhancedText = await response.text();
-        setResult(enhancedText);
+        if (!response.ok) throw new Error(`Enhance failed: ${response.status}`);
+
+        let enhancedText = "";
+        await readEvents(response, (event, data) => {
+          if (event === "chunk") {
+            enhancedText += data;
+            setResult(enhancedText);
+          }
+          if (event === "error") throw new Error(data);
+        });
       }
 
       if (type === "analyzeEnhanced") {